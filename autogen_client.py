@@ -4,19 +4,86 @@ This is an example showing how to integrate the agent_metrics module.
 """
 
 import asyncio
+import os
 import time
 import mlflow
 from autogen_agentchat.conditions import TextMentionTermination
 from autogen_agentchat.teams import SelectorGroupChat
 
 from exam.agent import get_agents
-from exam.llm_provider import get_llm
+from exam.llm_provider import close_llms, get_llm
 from exam.ml_flow import SimpleTokenCounter, calculate_overhead
 
+# Keyword the agents emit to end the conversation (see the agents' system messages)
+TERMINATION_KEYWORD = "TERMINATE"
+
+TASK_TEMPLATE = (
+    "Start the exam assessment for date %s. "
+    "First load exam AND checklists calling the uploader agent. "
+    "Then assess the students with the assessor agent."
+)
+
+# Resolved once: older MLflow releases ship without the autogen flavor
+_AUTOLOG = getattr(getattr(mlflow, 'autogen', None), 'autolog', None)
+_AUTOLOG_INSTALLED = False
+
+# Upper bound on messages waiting for bookkeeping before the stream is paused
+MESSAGE_QUEUE_SIZE = 64
+
+
+async def _drain(queue: asyncio.Queue, cost_counter: SimpleTokenCounter):
+    """Consume streamed messages (until a None sentinel) and do the per-message bookkeeping."""
+    # Console lines are written once per burst of queued messages instead of once per line
+    pending = []
+    while (message := await queue.get()) is not None:
+        # The final TaskResult carries no source: only chat messages and events are reported
+        source = getattr(message, 'source', None)
+        if source is not None:
+            pending.append(f"\n[{source}]: {message.content}")
+
+            usage = getattr(message, 'models_usage', None)
+            if usage is not None:
+                cost_counter.add(usage)
+                pending.append(str(usage))
+
+        if pending and queue.empty():
+            print("\n".join(pending))
+            pending.clear()
+
+    if pending:
+        print("\n".join(pending))
+
+
+async def _put(queue: asyncio.Queue, message, consumer: asyncio.Task):
+    """
+    Queue a message for the consumer without blocking on a full queue once the consumer has stopped:
+    its exception is re-raised instead.
+    """
+    if not consumer.done() and not queue.full():
+        queue.put_nowait(message)
+        return
+
+    if not consumer.done():
+        put = asyncio.ensure_future(queue.put(message))
+        await asyncio.wait((put, consumer), return_when=asyncio.FIRST_COMPLETED)
+        if put.done():
+            return
+        put.cancel()
+
+    consumer.result()
+    raise RuntimeError("Message consumer stopped before the end of the stream")
+
+
+def _install_autolog():
+    """Enable the MLflow AutoGen autologging once per process, when the flavor is available."""
+    global _AUTOLOG_INSTALLED
+    if _AUTOLOG is not None and not _AUTOLOG_INSTALLED:
+        _AUTOLOG()
+        _AUTOLOG_INSTALLED = True
+
 
 async def main():
-    if hasattr(mlflow, 'autogen'):
-        mlflow.autogen.autolog()
+    _install_autolog()
 
     exam_date = input("Please enter the exam date (e.g., 2025-06-05): ").strip()
     if not exam_date:
@@ -25,45 +92,61 @@ async def main():
     # Initialize counters
     cost_counter = SimpleTokenCounter()
 
+    # Fail fast against the local tracking server instead of MLflow's long default backoff
+    os.environ.setdefault("MLFLOW_HTTP_REQUEST_MAX_RETRIES", "3")
+    os.environ.setdefault("MLFLOW_HTTP_REQUEST_BACKOFF_FACTOR", "1")
+
     mlflow.set_tracking_uri("http://localhost:5000")
     mlflow.set_experiment("AutoGen_Exam_Assessment")
+    # Log calls return immediately and are flushed by a background thread
+    mlflow.config.enable_async_logging(True)
+
+    # Client for the post-run analysis; MLflow reuses its pooled HTTP session across calls
+    client = mlflow.MlflowClient()
 
     with mlflow.start_run()as run:
-        mlflow.log_param("framework", "AutoGen")
-        mlflow.log_param("exam_date", exam_date)
-        mlflow.log_param("metrics_tracking_enabled", True)
+        # Params go out in one batched request up front, so they are recorded even if the run fails
+        mlflow.log_params({
+            "framework": "AutoGen",
+            "exam_date": exam_date,
+            "metrics_tracking_enabled": True,
+            "model_name": "gpt-4o",
+        })
 
         llm_client = get_llm()
-        mlflow.log_param("model_name", "gpt-4o")
 
         team = SelectorGroupChat(
             get_agents(),
             model_client=llm_client,
-            termination_condition=TextMentionTermination("TERMINATE")
+            termination_condition=TextMentionTermination(TERMINATION_KEYWORD)
         )
 
-        task = f"Start the exam assessment for date {exam_date}. First load exam AND checklists calling the uploader agent. Then assess the students with the assessor agent."
+        task = TASK_TEMPLATE % exam_date
 
         print(f"\n[AUTOGEN] Starting Assessment for {exam_date}...\n")
 
-        start_time = time.time()
+        # Monotonic clock: immune to wall-clock adjustments during the run
+        start_time = time.perf_counter_ns()
 
         # Start metrics tracking
         message_count = 0
-
-        async for message in team.run_stream(task=task):
-            message_count += 1
-
-            if hasattr(message, 'source') and hasattr(message, 'content'):
-                print(f"\n[{message.source}]: {message.content}")
-
-                if hasattr(message, 'models_usage'):
-                    cost_counter.add(message.models_usage)
-                    print(message.models_usage)
-
-
-        end_time = time.time()
-        duration = end_time - start_time
+        queue = asyncio.Queue(maxsize=MESSAGE_QUEUE_SIZE)
+        consumer = asyncio.create_task(_drain(queue, cost_counter))
+
+        try:
+            async for message in team.run_stream(task=task):
+                message_count += 1
+                await _put(queue, message, consumer)
+            await _put(queue, None, consumer)
+            await consumer
+        finally:
+            # Reached with the consumer still running only when the stream failed
+            if not consumer.done():
+                consumer.cancel()
+                await asyncio.gather(consumer, return_exceptions=True)
+
+        end_time = time.perf_counter_ns()
+        duration = (end_time - start_time) / 1e9
 
         # Log basic metrics (as before)
         print(f"\nTotal Tokens: {cost_counter.total}")
@@ -71,13 +154,31 @@ async def main():
         print(f"Completion Tokens: {cost_counter.completion}")
         print(f"Duration (seconds): {duration:.2f}")
 
-        mlflow.log_metric("total_tokens", cost_counter.total)
-        mlflow.log_metric("prompt_tokens", cost_counter.prompt)
-        mlflow.log_metric("completion_tokens", cost_counter.completion)
-        mlflow.log_metric("duration_seconds", duration)
+        mlflow.log_metrics({
+            "total_tokens": cost_counter.total,
+            "prompt_tokens": cost_counter.prompt,
+            "completion_tokens": cost_counter.completion,
+            "duration_seconds": duration,
+        })
+
+        # The overhead analysis only reads traces, so it can overlap with flushing the queued metrics.
+        # Both are blocking HTTP work and run in worker threads to keep the event loop free.
+        await asyncio.gather(
+            asyncio.to_thread(mlflow.flush_async_logging),
+            asyncio.to_thread(
+                calculate_overhead, run.info.run_id, duration,
+                client=client, experiment_id=run.info.experiment_id
+            ),
+        )
+
 
-        calculate_overhead(run.info.run_id, duration)
+async def run():
+    try:
+        await main()
+    finally:
+        # One shared client serves the whole run: its connection pool is closed only on the way out
+        await close_llms()
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    asyncio.run(run())
@@ -6,6 +6,12 @@ from pathlib import Path
 from io import StringIO
 from markdown import markdown
 
+# The libyaml C backend parses several times faster; the pure-Python class is the fallback
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 DIR_ROOT = Path(__file__).parent.parent
 DEFAULT_QUESTIONS_FILE = DIR_ROOT / "static" / "questions.csv"
 
@@ -44,9 +50,9 @@ def load_exam_from_yaml(questions_file: str, responses_file: str, grades_file: s
         FileNotFoundError: If required files don't exist
         ValueError: If YAML parsing fails
     """
-    import yaml
     import re
     from pathlib import Path
+    from exam.cache import load_yaml_cached
 
     if exams_dir is None:
         exams_dir = DIR_ROOT / "static" / "se-exams"
@@ -75,12 +81,9 @@ def load_exam_from_yaml(questions_file: str, responses_file: str, grades_file: s
             f"Searched in: {exams_dir}"
         )
 
-    # Load YAML files
-    with open(questions_path, 'r', encoding='utf-8') as f:
-        questions_data = yaml.safe_load(f)
-
-    with open(responses_path, 'r', encoding='utf-8') as f:
-        responses_data = yaml.safe_load(f)
+    # Load YAML files (parsed documents are cached on disk while the files are unchanged)
+    questions_data = load_yaml_cached(questions_path)
+    responses_data = load_yaml_cached(responses_path)
 
     # Load grades file if provided
     grades_data = None
@@ -91,8 +94,7 @@ def load_exam_from_yaml(questions_file: str, responses_file: str, grades_file: s
             grades_path = exams_dir / grades_file
 
         if grades_path.exists():
-            with open(grades_path, 'r', encoding='utf-8') as f:
-                grades_data = yaml.safe_load(f)
+            grades_data = load_yaml_cached(grades_path)
         else:
             print(f"[LOAD_EXAM] Warning: grades file not found: {grades_path}")
 
@@ -1,20 +1,17 @@
+from pathlib import Path
+
+import orjson
 from autogen_agentchat.agents import AssistantAgent
-from exam.llm_provider import get_llm
+from exam.assess import TEMPLATE_DIGEST
+from exam.cache import disk_cached
+from exam.llm_provider import DEFAULT_MODEL_NAME, get_llm
 from exam.mcp import ExamMCPServer
+from exam.solution import cache_stamps
 import mlflow
 from mlflow.entities import SpanType
 
 
-
-@mlflow.trace(span_type=SpanType.AGENT)
-def get_agents():
-    mcp = ExamMCPServer()
-    model = get_llm()
-    UploaderAgent = AssistantAgent(
-        name="uploader",
-        model_client=model,
-        tools=[mcp.load_exam_from_yaml_tool, mcp.load_checklist],
-        system_message="""You are the Exam Data Manager.
+UPLOADER_SYSTEM_MESSAGE = """You are the Exam Data Manager.
 
         YOUR WORKFLOW (Follow strictly):
         1. Call `load_exam_from_yaml_tool`. 
@@ -23,12 +20,8 @@ def get_agents():
         2. The output will contain 'question_ids'. Call `load_checklist` with these IDs.
         3. ONLY AFTER both tools success, output: "DATA READY", after every student exam is been evaluated output: "TERMINATE" .
         """
-    )
-    AssessorAgent = AssistantAgent(
-        name="assessor",
-        model_client=model,
-        tools=[mcp.list_students, mcp.assess_students_batch],
-        system_message="""You are the Exam Grader.
+
+ASSESSOR_SYSTEM_MESSAGE = """You are the Exam Grader.
 
         CONDITION: Do NOT act until the uploader says "DATA READY".
 
@@ -37,6 +30,63 @@ def get_agents():
         2. Call `assess_students_batch` passing ALL emails at once and after 
         3. Say "TERMINATE" in chat when assess_students_batch methods ends.
         """
+
+
+def _checklist_stamps(question_id: str):
+    try:
+        question = ExamMCPServer.questions_store.question(question_id)
+    except KeyError:
+        return None
+    return cache_stamps(question)
+
+
+def _batch_inputs():
+    """Everything besides the requested emails that the grades of a batch depend on."""
+    context = ExamMCPServer.context
+    exams = []
+    for exam_id in sorted(context.loaded_exams):
+        # Checklists missing from the context are read from these files while the batch runs
+        checklists = [
+            (question["id"], _checklist_stamps(question["id"]))
+            for question in context.loaded_exams[exam_id]["questions"]
+        ]
+        exams.append((exam_id, context.exam_stamps.get(exam_id), checklists))
+    return exams, DEFAULT_MODEL_NAME, TEMPLATE_DIGEST
+
+
+def _replayed_batch(result: str) -> str:
+    """
+    Marks a batch summary as replayed. Its ndjson_path belongs to the run that produced it:
+    it is dropped when that file has been deleted since.
+    """
+    summary = orjson.loads(result)
+    summary["replayed"] = True
+    if summary.get("ndjson_path") and not Path(summary["ndjson_path"]).exists():
+        summary["ndjson_path"] = None
+    return orjson.dumps(summary, option=orjson.OPT_INDENT_2).decode("utf-8")
+
+
+# Batch results depend on the files of the loaded exams and of their checklists, the model and the prompts
+# as well as on the requested emails: editing any of them yields a fresh assessment.
+# The loading tools are not cached: they fill the in-memory context as a side effect.
+_cached_batch = disk_cached("assess_students_batch", key_extra=_batch_inputs, on_replay=_replayed_batch)
+
+
+@mlflow.trace(span_type=SpanType.AGENT)
+def get_agents():
+    mcp = ExamMCPServer()
+    model = get_llm()
+    UploaderAgent = AssistantAgent(
+        name="uploader",
+        model_client=model,
+        tools=[mcp.load_exam_from_yaml_tool, mcp.load_checklist],
+        system_message=UPLOADER_SYSTEM_MESSAGE
+    )
+    AssessorAgent = AssistantAgent(
+        name="assessor",
+        model_client=model,
+        tools=[mcp.list_students, _cached_batch(mcp.assess_students_batch)],
+        system_message=ASSESSOR_SYSTEM_MESSAGE
     )
 
     return [UploaderAgent, AssessorAgent]
\ No newline at end of file
@@ -5,7 +5,7 @@ from autogen_agentchat.messages import StructuredMessage
 from autogen_agentchat.ui import Console
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 
-from exam.llm_provider import get_llm
+from exam.llm_provider import close_llms, get_llm
 from exam.mcp import ExamMCPServer
 
 async def main():
@@ -18,8 +18,11 @@ async def main():
         system_message="Use tools to solve tasks.",
     )
 
-    result = await agent.run(task="You have to upload exam data from yaml file and chcklist.")
-    print(result.messages)
+    try:
+        result = await agent.run(task="You have to upload exam data from yaml file and chcklist.")
+        print(result.messages)
+    finally:
+        await close_llms()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,17 +1,23 @@
+import asyncio
+import hashlib
 import os
 import re
 import sys
-import json
+import unicodedata
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
+
+import orjson
 from autogen_core.models import UserMessage
+from autogen_core.tools import ToolSchema
 
 from pydantic import BaseModel, Field
 
 from exam import DIR_ROOT
 from exam import get_questions_store
-from exam.llm_provider import get_llm
+from exam.cache import DIR_CACHE, atomic_write_bytes, evict_lru_throttled
+from exam.llm_provider import DEFAULT_MODEL_NAME, LLM_CONCURRENCY, get_llm
 from exam.solution import Answer
 
 OUTPUT_FILE = os.getenv("OUTPUT_FILE", None)
@@ -24,6 +30,24 @@ ALL_QUESTIONS = get_questions_store()
 PATTERN_QUESTION_FOLDER = re.compile(r"^Q\d+\s+-\s+(\w+-\d+)$")
 FILE_TEMPLATE = DIR_ROOT / "exam" / "assess" / "prompt-template.txt"
 TEMPLATE = FILE_TEMPLATE.read_text(encoding="utf-8")
+FILE_TEMPLATE_BATCH = DIR_ROOT / "exam" / "assess" / "prompt-template-batch.txt"
+TEMPLATE_BATCH = FILE_TEMPLATE_BATCH.read_text(encoding="utf-8")
+
+# Answers shorter than this (once stripped) fail every feature without asking the LLM
+MIN_RESPONSE_LENGTH = 3
+
+# Separators of the summary text
+SEP = "=" * 70
+DASH = "-" * 70
+
+VERB_IDEAL = "should be present"
+VERB_ACTUAL = "is actually present"
+
+# Feature assessments already computed for identical (question, feature, response) triples
+DIR_ASSESSMENT_CACHE = DIR_CACHE / "assessments"
+# Least recently used assessments are evicted beyond this count
+ASSESSMENT_CACHE_SIZE = int(os.getenv("ASSESS_CACHE_SIZE", "20000"))
+ASSESS_CACHE_DISABLE = os.getenv("ASSESS_CACHE_DISABLE", "").strip().lower() in ("1", "true", "yes")
 
 
 class FeatureType(str, Enum):
@@ -39,11 +63,11 @@ class Feature:
 
     @property
     def verb_ideal(self) -> str:
-        return "should be present"
+        return VERB_IDEAL
 
     @property
     def verb_actual(self) -> str:
-        return "is actually present"
+        return VERB_ACTUAL
 
     @property
     def is_core(self) -> bool:
@@ -71,6 +95,145 @@ class FeatureAssessment(BaseModel):
     motivation: str = Field(description="Explanation of why the feature is present or not")
 
 
+TOO_SHORT_ASSESSMENT = FeatureAssessment(
+    satisfied=False,
+    motivation="Your answer is too short to be evaluated."
+)
+
+
+class FeatureAssessmentBatch(BaseModel):
+    items: list[FeatureAssessment] = Field(description="One assessment per feature, in the order the features are listed")
+
+
+# Templates with the per-run constants already substituted, leaving only the per-answer fields
+TEMPLATE_PARTIAL = (
+    TEMPLATE
+    .replace("{class_name}", FeatureAssessment.__name__)
+    .replace("{feature_verb_ideal}", VERB_IDEAL)
+    .replace("{feature_verb_actual}", VERB_ACTUAL)
+)
+TEMPLATE_BATCH_PARTIAL = TEMPLATE_BATCH.replace("{class_name}", FeatureAssessmentBatch.__name__)
+
+# Identifies the prompts behind an assessment: editing either template invalidates the cached ones
+TEMPLATE_DIGEST = hashlib.sha256("\0".join((TEMPLATE, TEMPLATE_BATCH)).encode("utf-8")).hexdigest()
+
+
+def _tool_schema(output_type: type[BaseModel], name: str, description: str) -> ToolSchema:
+    return ToolSchema(name=name, description=description, parameters=output_type.model_json_schema())
+
+
+# Tools the model is forced to call when it has no native structured output
+FEATURE_ASSESSMENT_TOOL = _tool_schema(
+    FeatureAssessment,
+    name="record_feature_assessment",
+    description="Record whether the feature is present in the student's answer, and why.",
+)
+FEATURE_ASSESSMENT_BATCH_TOOL = _tool_schema(
+    FeatureAssessmentBatch,
+    name="record_feature_assessments",
+    description="Record, for each listed feature, whether it is present in the student's answer, and why.",
+)
+
+
+async def request_structured_output(llm, prompt: str, output_type: type[BaseModel], tool: ToolSchema):
+    """
+    Asks the model to fill an instance of output_type for the given prompt.
+    Uses native structured output when the model supports it, a forced call to tool otherwise:
+    either way the reply is schema-constrained JSON, with no parsing heuristics.
+    """
+    messages = [UserMessage(content=prompt, source="user")]
+
+    if llm.model_info.get("structured_output"):
+        response = await llm.create(messages=messages, json_output=output_type)
+        return output_type.model_validate_json(response.content)
+
+    response = await llm.create(messages=messages, tools=[tool], tool_choice="required")
+    if not isinstance(response.content, list) or not response.content:
+        raise ValueError(f"Expected a {tool['name']} tool call, got: {response.content!r}")
+    return output_type.model_validate_json(response.content[0].arguments)
+
+
+def format_features(features: list[Feature]) -> str:
+    return "\n".join(
+        f"    {i}. ({feature.type.value}) {feature.description}"
+        for i, feature in enumerate(features, start=1)
+    )
+
+
+def _normalize_response(response: str) -> str:
+    return unicodedata.normalize("NFKC", response).strip().lower()
+
+
+def _cache_key(question_id: str, feature: Feature, response: str) -> str:
+    payload = "\0".join((
+        DEFAULT_MODEL_NAME, TEMPLATE_DIGEST, question_id,
+        feature.type.name, feature.description, _normalize_response(response)
+    ))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cache_path(key: str) -> Path:
+    return DIR_ASSESSMENT_CACHE / key[:2] / f"{key}.json"
+
+
+def _cache_get(key: str) -> FeatureAssessment | None:
+    """Returns the cached assessment of key, None when missing or unreadable."""
+    path = _cache_path(key)
+    try:
+        assessment = FeatureAssessment.model_validate_json(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[CACHE] Ignoring unreadable assessment {key}: {e}")
+        return None
+
+    try:
+        os.utime(path)  # Mark the entry as recently used
+    except OSError:
+        pass
+    return assessment
+
+
+def _cache_put(key: str, value: FeatureAssessment):
+    atomic_write_bytes(_cache_path(key), value.model_dump_json().encode("utf-8"))
+
+
+def _cache_get_many(keys: list[str]) -> list[FeatureAssessment | None]:
+    return [_cache_get(key) for key in keys]
+
+
+def _cache_put_many(entries: list[tuple[str, FeatureAssessment]]):
+    for key, value in entries:
+        try:
+            _cache_put(key, value)
+        except OSError as e:
+            print(f"[CACHE] Could not store assessment {key}: {e}")
+
+
+QUESTION_NUMBER_PREFIX = "Question "
+
+
+def parse_question_number(number: str) -> int:
+    """Parses a question number of the form "Question N" (or a bare "N")."""
+    if number.startswith(QUESTION_NUMBER_PREFIX):
+        return int(number[len(QUESTION_NUMBER_PREFIX):])
+    return int(number)
+
+
+@dataclass(frozen=True)
+class PreparedQuestion:
+    """A question of an exam, resolved once and shared by the assessments of all its students."""
+    info: dict
+    number: int
+    question: object = None
+    checklist: Answer | None = None
+    error: str | None = None
+
+    @property
+    def max_score(self) -> float:
+        return self.info["score"]
+
+
 class Assessor:
     """
     Class for the structured assessment of student answers.
@@ -84,14 +247,13 @@ class Assessor:
         Args:
             evaluations_dir: Directory to save evaluations (default: DIR_ROOT/evaluations)
         """
-        from exam.llm_provider import get_llm
-
         if evaluations_dir is None:
             self.evaluations_dir = DIR_ROOT / "evaluations"
         else:
             self.evaluations_dir = Path(evaluations_dir)
 
         self.evaluations_dir.mkdir(parents=True, exist_ok=True)
+        self._llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
 
     async def assess_single_answer(
             self,
@@ -120,52 +282,16 @@ class Assessor:
             }
 
         try:
+            features = [feature for _, feature in enumerate_features(checklist)]
+            if len(student_response.strip()) < MIN_RESPONSE_LENGTH:
+                results = [TOO_SHORT_ASSESSMENT] * len(features)
+            else:
+                results = await self._assess_features(get_llm(), question, features, student_response)
+
             feature_assessments_list = []
-            feature_assessments_dict = {}
-
-            for index, feature in enumerate_features(checklist):
-                prompt = TEMPLATE.format(
-                    class_name="FeatureAssessment",
-                    question=question.text,
-                    feature_type=feature.type.value,
-                    feature_verb_ideal=feature.verb_ideal,
-                    feature_verb_actual=feature.verb_actual,
-                    feature=feature.description,
-                    answer=student_response
-                )
-
-                llm = get_llm()
-
-                json_prompt = f"""{prompt}
-
-                You must respond with ONLY a valid JSON object matching this schema:
-                {{
-                    "satisfied": boolean,
-                    "motivation": string
-                }}
-
-                Do not include any additional fields or text outside the JSON object."""
-
-                response = await llm.create(
-                    messages=[UserMessage(content=json_prompt, source="user")]
-                )
-
-                if hasattr(response, 'content'):
-                    json_str = response.content
-                elif isinstance(response, str):
-                    json_str = response
-                else:
-                    json_str = response.content
-
-                json_str = json_str.strip()
-                if json_str.startswith('```json'):
-                    json_str = json_str.replace('```json', '').replace('```', '').strip()
-                if json_str.startswith('```'):
-                    json_str = json_str.replace('```', '').strip()
-
-                result_dict = json.loads(json_str)
-                result = FeatureAssessment(**result_dict)
+            feature_outcomes = []
 
+            for feature, result in zip(features, results):
                 feature_assessments_list.append({
                     "feature": feature.description,
                     "feature_type": feature.type.name,
@@ -173,10 +299,10 @@ class Assessor:
                     "motivation": result.motivation
                 })
 
-                feature_assessments_dict[feature] = result
+                feature_outcomes.append((feature.type, result.satisfied))
 
             score, breakdown, stats = self.calculate_score(
-                feature_assessments_dict,
+                feature_outcomes,
                 max_score
             )
 
@@ -197,6 +323,111 @@ class Assessor:
                 "max_score": max_score
             }
 
+    async def _assess_features(self, llm, question, features: list[Feature], student_response: str) -> list:
+        """
+        Assesses the features of an answer, reusing the cached assessments of identical answers.
+        Only the features missing from the cache are sent to the LLM.
+        """
+        if ASSESS_CACHE_DISABLE:
+            return await self._request_assessments(llm, question, features, student_response)
+
+        keys = [_cache_key(question.id, feature, student_response) for feature in features]
+        # Cache entries are read and written in a worker thread, to keep the event loop free
+        results = await asyncio.to_thread(_cache_get_many, keys)
+        missing = [i for i, cached in enumerate(results) if cached is None]
+
+        if missing:
+            assessed = await self._request_assessments(
+                llm, question, [features[i] for i in missing], student_response
+            )
+            for i, result in zip(missing, assessed):
+                results[i] = result
+            await asyncio.to_thread(_cache_put_many, [(keys[i], results[i]) for i in missing])
+            await evict_lru_throttled(DIR_ASSESSMENT_CACHE, ASSESSMENT_CACHE_SIZE, pattern="*/*.json")
+
+        return results
+
+    async def _request_assessments(self, llm, question, features: list[Feature], student_response: str) -> list:
+        """
+        Assesses all the given features of an answer with a single LLM request.
+        Falls back to one request per feature when the reply does not line up with the features.
+        """
+        if not features:
+            return []
+
+        prompt = TEMPLATE_BATCH_PARTIAL.format(
+            question=question.text,
+            features=format_features(features),
+            answer=student_response
+        )
+
+        async with self._llm_semaphore:
+            batch = await request_structured_output(llm, prompt, FeatureAssessmentBatch, FEATURE_ASSESSMENT_BATCH_TOOL)
+
+        if len(batch.items) == len(features):
+            return batch.items
+
+        print(f"[ASSESS] {question.id}: got {len(batch.items)} assessments for {len(features)} features, "
+              f"assessing them one by one")
+
+        async def assess_feature(feature):
+            prompt = TEMPLATE_PARTIAL.format(
+                question=question.text,
+                feature_type=feature.type.value,
+                feature=feature.description,
+                answer=student_response
+            )
+
+            async with self._llm_semaphore:
+                return await request_structured_output(llm, prompt, FeatureAssessment, FEATURE_ASSESSMENT_TOOL)
+
+        # The features are assessed concurrently; results keep the checklist order
+        results = await asyncio.gather(*(assess_feature(f) for f in features), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    @staticmethod
+    def prepare_exam(exam_questions: list, questions_store, context) -> list[PreparedQuestion]:
+        """
+        Resolves the questions of an exam and their checklists.
+        The result can be shared by the assessments of every student taking the exam.
+
+        Args:
+            exam_questions: List of dicts with question info
+            questions_store: QuestionsStore instance
+            context: AssessmentContext to access checklists
+
+        Returns:
+            list of PreparedQuestion, in the order of exam_questions.
+        """
+        from exam.solution import load_cache as load_answer_cache
+
+        prepared = []
+        for question_info in exam_questions:
+            question_num = parse_question_number(question_info["number"])
+
+            try:
+                question = questions_store.question(question_info["id"])
+                checklist = context.get_checklist(question_info["id"])
+
+                if not checklist:
+                    checklist = load_answer_cache(question)
+                    if checklist:
+                        context.store_checklist(question_info["id"], checklist)
+
+                if not checklist:
+                    raise ValueError(f"No checklist found for question {question_info['id']}")
+
+            except Exception as e:
+                prepared.append(PreparedQuestion(question_info, question_num, error=str(e)))
+                continue
+
+            prepared.append(PreparedQuestion(question_info, question_num, question, checklist))
+
+        return prepared
+
     async def assess_student_exam(
             self,
             student_email: str,
@@ -205,7 +436,8 @@ class Assessor:
             questions_store,
             context,
             save_results: bool = True,
-            original_grades: dict = None
+            original_grades: dict = None,
+            prepared: list[PreparedQuestion] = None
     ) -> dict:
         """
         Evaluates all answers for a student.
@@ -218,18 +450,20 @@ class Assessor:
             context: AssessmentContext to access checklists
             save_results: If True, saves results to file
             original_grades: True grades
+            prepared: Result of prepare_exam for exam_questions, computed here if not given
 
         Returns:
             dict containing assessment results and saved file paths.
         """
-        from exam.solution import load_cache as load_answer_cache
+        if prepared is None:
+            prepared = self.prepare_exam(exam_questions, questions_store, context)
 
         assessments = []
-        total_score = 0.0
-        total_max_score = 0.0
+        pending = []  # (position in assessments, question metadata, assessment coroutine)
 
-        for question_info in exam_questions:
-            question_num = int(question_info["number"].replace("Question ", ""))
+        for entry in prepared:
+            question_info = entry.info
+            question_num = entry.number
 
             if question_num not in student_responses:
                 assessments.append({
@@ -238,55 +472,46 @@ class Assessor:
                     "question_text": question_info.get("text", ""),
                     "status": "no_response",
                     "score": 0.0,
-                    "max_score": question_info["score"]
+                    "max_score": entry.max_score
                 })
-                total_max_score += question_info["score"]
                 continue
 
-            try:
-                question = questions_store.question(question_info["id"])
-                checklist = context.get_checklist(question_info["id"])
-
-                if not checklist:
-                    checklist = load_answer_cache(question)
-                    if checklist:
-                        context.store_checklist(question_info["id"], checklist)
-
-                if not checklist:
-                    raise ValueError(f"No checklist found for question {question_info['id']}")
-
-                response_text = student_responses[question_num]
-
-                assessment = await self.assess_single_answer(
-                    question=question,
-                    checklist=checklist,
-                    student_response=response_text,
-                    max_score=question_info["score"]
-                )
-
-                assessment.update({
-                    "question_number": question_num,
-                    "question_id": question_info["id"],
-                    "question_text": question.text,
-                    "student_response": response_text
-                })
-
-                assessments.append(assessment)
-
-                total_score += assessment["score"]
-                total_max_score += question_info["score"]
-
-            except Exception as e:
+            if entry.error is not None:
                 assessments.append({
                     "question_number": question_num,
                     "question_id": question_info["id"],
                     "question_text": question_info.get("text", ""),
                     "status": "error",
-                    "error": str(e),
+                    "error": entry.error,
                     "score": 0.0,
-                    "max_score": question_info["score"]
+                    "max_score": entry.max_score
                 })
-                total_max_score += question_info["score"]
+                continue
+
+            response_text = student_responses[question_num]
+            metadata = {
+                "question_number": question_num,
+                "question_id": question_info["id"],
+                "question_text": entry.question.text,
+                "student_response": response_text
+            }
+            coroutine = self.assess_single_answer(
+                question=entry.question,
+                checklist=entry.checklist,
+                student_response=response_text,
+                max_score=entry.max_score
+            )
+            pending.append((len(assessments), metadata, coroutine))
+            assessments.append(None)
+
+        # All answered questions are assessed concurrently (assess_single_answer never raises)
+        results = await asyncio.gather(*(coroutine for _, _, coroutine in pending))
+        for (position, metadata, _), assessment in zip(pending, results):
+            assessment.update(metadata)
+            assessments[position] = assessment
+
+        total_score = sum(assessment["score"] for assessment in assessments)
+        total_max_score = sum(question_info["score"] for question_info in exam_questions)
 
         result = {
             "student_email": student_email,
@@ -299,14 +524,15 @@ class Assessor:
         }
 
         if save_results:
-            saved_files = self._save_assessment_results(student_email, result, exam_questions)
+            saved_files = await self._save_assessment_results(student_email, result, exam_questions)
             result["saved_files"] = saved_files
 
         return result
 
-    def _save_assessment_results(self, student_email: str, result: dict, exam_questions: list) -> dict:
+    async def _save_assessment_results(self, student_email: str, result: dict, exam_questions: list) -> dict:
         """
         Saves assessment results to files.
+        The writes run in worker threads, so they do not stall the assessments in flight.
 
         Args:
             student_email: Student email
@@ -317,17 +543,18 @@ class Assessor:
             dict with paths of saved files
         """
         student_dir = self.evaluations_dir / student_email
-        student_dir.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(student_dir.mkdir, parents=True, exist_ok=True)
 
         assessment_file = student_dir / "assessment.json"
-        with open(assessment_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        assessment_content = orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
 
         summary_file = student_dir / "summary.txt"
         summary_content = self._generate_summary_text(student_email, result, exam_questions)
 
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            f.write(summary_content)
+        await asyncio.gather(
+            asyncio.to_thread(assessment_file.write_bytes, assessment_content),
+            asyncio.to_thread(summary_file.write_text, summary_content, encoding='utf-8'),
+        )
 
         return {
             "assessment": str(assessment_file),
@@ -338,19 +565,23 @@ class Assessor:
         """
         Generates the readable summary text.
         """
-        lines = []
-        lines.append("STUDENT ASSESSMENT SUMMARY")
-        lines.append("=" * 70)
-        lines.append("")
-        lines.append(f"Student: {student_email}")
-        lines.append(f"Calculated Score: {result['calculated_score']:.2f}/{result['max_score']}")
-        lines.append(f"Calculated Percentage: {result['percentage']}%")
+        return "\n".join(self._iter_summary_lines(student_email, result))
+
+    @staticmethod
+    def _iter_summary_lines(student_email: str, result: dict):
+        """Yields the lines of the readable summary text."""
+        yield "STUDENT ASSESSMENT SUMMARY"
+        yield SEP
+        yield ""
+        yield f"Student: {student_email}"
+        yield f"Calculated Score: {result['calculated_score']:.2f}/{result['max_score']}"
+        yield f"Calculated Percentage: {result['percentage']}%"
 
         original_grades = result.get('original_grades', {})
 
         if original_grades:
             original_total = original_grades.get("total_grade", 0)
-            lines.append(f"Original Moodle Grade: {original_total:.2f}/27.00")
+            yield f"Original Moodle Grade: {original_total:.2f}/27.00"
 
             score_diff = result['calculated_score'] - original_total
             diff_text = f"Difference: {score_diff:+.2f} "
@@ -359,62 +590,61 @@ class Assessor:
             elif abs(score_diff) < 2.0:
                 diff_text += "( Reasonable)"
 
-        lines.append(f"Scoring System: {result['scoring_system']}")
-        lines.append("")
-        lines.append("=" * 70)
-        lines.append("")
+        yield f"Scoring System: {result['scoring_system']}"
+        yield ""
+        yield SEP
+        yield ""
+
+        question_grades = original_grades.get('question_grades') if original_grades else None
 
         for assessment in result["assessments"]:
             question_num = assessment['question_number']
-            lines.append(f"Question {question_num}: {assessment['question_id']}")
-            lines.append("-" * 70)
+            yield f"Question {question_num}: {assessment['question_id']}"
+            yield DASH
 
             if assessment['status'] == 'assessed':
-                lines.append(f"Calculated Score: {assessment['score']:.2f}/{assessment['max_score']}")
+                yield f"Calculated Score: {assessment['score']:.2f}/{assessment['max_score']}"
 
-                if original_grades and 'question_grades' in original_grades:
-                    orig_q_grade = original_grades['question_grades'].get(question_num)
+                if question_grades is not None:
+                    orig_q_grade = question_grades.get(question_num)
                     if orig_q_grade is not None:
                         diff = assessment['score'] - orig_q_grade
-                        lines.append(f"Original Grade: {orig_q_grade:.2f}/{assessment['max_score']}")
-                        lines.append(f"Difference: {diff:+.2f}")
+                        yield f"Original Grade: {orig_q_grade:.2f}/{assessment['max_score']}"
+                        yield f"Difference: {diff:+.2f}"
 
-                lines.append(f"Breakdown: {assessment['breakdown']}")
-                lines.append("")
+                yield f"Breakdown: {assessment['breakdown']}"
+                yield ""
 
-                core_features = [fa for fa in assessment['feature_assessments']
-                                 if fa['feature_type'] == 'CORE']
-                important_features = [fa for fa in assessment['feature_assessments']
-                                      if fa['feature_type'] == 'DETAILS_IMPORTANT']
+                core_features, important_features = [], []
+                for fa in assessment['feature_assessments']:
+                    (core_features if fa['feature_type'] == 'CORE' else important_features).append(fa)
 
                 if core_features:
-                    lines.append("CORE Elements:")
+                    yield "CORE Elements:"
                     for fa in core_features:
                         status = "[OK]" if fa['satisfied'] else "[MISSING]"
-                        lines.append(f"  {status} {fa['feature']}")
-                        lines.append(f"       {fa['motivation']}")
-                        lines.append("")
+                        yield f"  {status} {fa['feature']}"
+                        yield f"       {fa['motivation']}"
+                        yield ""
 
                 if important_features:
-                    lines.append("Important Details:")
+                    yield "Important Details:"
                     for fa in important_features:
                         status = "[OK]" if fa['satisfied'] else "[MISSING]"
-                        lines.append(f"  {status} {fa['feature']}")
-                        lines.append(f"       {fa['motivation']}")
-                        lines.append("")
+                        yield f"  {status} {fa['feature']}"
+                        yield f"       {fa['motivation']}"
+                        yield ""
 
             else:
-                lines.append(f"Status: {assessment['status']}")
+                yield f"Status: {assessment['status']}"
                 if 'error' in assessment:
-                    lines.append(f"Error: {assessment['error']}")
-
-            lines.append("")
-            lines.append("=" * 70)
-            lines.append("")
+                    yield f"Error: {assessment['error']}"
 
-        return "\n".join(lines)
+            yield ""
+            yield SEP
+            yield ""
 
-    def calculate_score(self, assessments: dict, max_score: float) -> tuple[float, str, dict]:
+    def calculate_score(self, assessments: list[tuple[FeatureType, bool]], max_score: float) -> tuple[float, str, dict]:
         """
         Calculates the score from an assessment dictionary.
         System:
@@ -423,7 +653,7 @@ class Assessor:
         - 100% Important (if Core missing - rare)
 
         Args:
-            assessments: dict[Feature, FeatureAssessment]
+            assessments: (feature type, satisfied) pair for each assessed feature
             max_score: Maximum score for the question
 
         Returns:
@@ -432,13 +662,18 @@ class Assessor:
         if not assessments:
             return 0.0, "No features assessed", {}
 
-        core_total = sum(1 for f in assessments if f.type == FeatureType.CORE)
-        core_satisfied = sum(1 for f, a in assessments.items()
-                             if f.type == FeatureType.CORE and a.satisfied)
-
-        important_total = sum(1 for f in assessments if f.type == FeatureType.DETAILS_IMPORTANT)
-        important_satisfied = sum(1 for f, a in assessments.items()
-                                  if f.type == FeatureType.DETAILS_IMPORTANT and a.satisfied)
+        core_total = core_satisfied = important_total = important_satisfied = 0
+        CORE = FeatureType.CORE
+        DETAILS_IMPORTANT = FeatureType.DETAILS_IMPORTANT
+        for feature_type, satisfied in assessments:
+            if feature_type is CORE:
+                core_total += 1
+                if satisfied:
+                    core_satisfied += 1
+            elif feature_type is DETAILS_IMPORTANT:
+                important_total += 1
+                if satisfied:
+                    important_satisfied += 1
 
         if core_total > 0 and important_total > 0:
             core_weight = 0.70
@@ -0,0 +1,192 @@
+"""
+On-disk caches shared by the exam tools.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+
+import yaml
+
+from exam import DIR_ROOT, YamlLoader
+
+DIR_CACHE = DIR_ROOT / ".cache"
+FILE_YAML_CACHE = DIR_CACHE / "yaml.db"
+
+# Minimum number of seconds between two evictions of the same cache directory, across processes
+EVICT_INTERVAL = 3600
+# File whose mtime records the last eviction of a cache directory
+EVICT_MARKER = ".last_eviction"
+
+# Entries kept per disk_cached namespace, least recently used ones are evicted beyond this count
+DISK_CACHE_SIZE = 256
+
+KEY_CACHE_MODE = "EXAM_CACHE_MODE"
+CACHE_MODES = ("off", "replay", "record")
+
+
+def cache_mode() -> str:
+    """
+    Returns the tool cache mode read from EXAM_CACHE_MODE:
+        off    - always call the tool (default)
+        replay - return the stored result when present, otherwise call the tool and store it
+        record - always call the tool and overwrite the stored result
+    """
+    mode = os.environ.get(KEY_CACHE_MODE, "off").strip().lower()
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Invalid {KEY_CACHE_MODE} '{mode}', expected one of {CACHE_MODES}")
+    return mode
+
+
+def cache_key(*parts) -> str:
+    """SHA-256 of the canonical JSON encoding of the given parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def atomic_write_bytes(path: Path, data: bytes):
+    """Writes data to path through a temporary file, so readers never see partial content."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def evict_lru(directory: Path, max_entries: int, pattern: str):
+    """Deletes the least recently used entries of a cache directory, keeping at most max_entries."""
+    entries = []
+    for entry in directory.glob(pattern):
+        try:
+            entries.append((entry.stat().st_mtime_ns, entry))
+        except FileNotFoundError:
+            continue
+    if len(entries) <= max_entries:
+        return
+    entries.sort()
+    for _, entry in entries[:len(entries) - max_entries]:
+        entry.unlink(missing_ok=True)
+
+
+_evicted_dirs = set()
+
+
+def _evict_lru_if_due(directory: Path, max_entries: int, pattern: str):
+    marker = directory / EVICT_MARKER
+    try:
+        if time.time() - marker.stat().st_mtime < EVICT_INTERVAL:
+            return
+    except FileNotFoundError:
+        if not directory.is_dir():
+            return
+    evict_lru(directory, max_entries, pattern)
+    marker.touch()
+
+
+async def evict_lru_throttled(directory: Path, max_entries: int, pattern: str):
+    """
+    Same as evict_lru, run in a worker thread at most once per process for each directory,
+    and skipped when the directory was evicted less than EVICT_INTERVAL seconds ago.
+    """
+    if directory in _evicted_dirs:
+        return
+    _evicted_dirs.add(directory)
+    await asyncio.to_thread(_evict_lru_if_due, directory, max_entries, pattern)
+
+
+def disk_cached(namespace: str, key_extra=None, on_replay=None, max_entries: int = DISK_CACHE_SIZE):
+    """
+    Decorator caching the results of an async tool on disk, keyed by its arguments.
+
+    Args:
+        namespace: Sub-directory of DIR_CACHE holding the entries of this tool
+        key_extra: Optional callable whose result is mixed into the key,
+                   for state the tool reads besides its arguments
+        on_replay: Optional callable applied to a stored result before it is returned,
+                   for results referring to what the original call left behind
+        max_entries: Number of entries kept, least recently used ones are evicted beyond it
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            mode = cache_mode()
+            if mode == "off":
+                return await func(*args, **kwargs)
+
+            extra = key_extra() if key_extra else None
+            directory = DIR_CACHE / namespace
+            path = directory / f"{cache_key(args, kwargs, extra)}.pkl"
+
+            if mode == "replay" and path.exists():
+                try:
+                    result = pickle.loads(path.read_bytes())
+                    os.utime(path)  # Mark the entry as recently used
+                    return on_replay(result) if on_replay else result
+                except Exception as e:
+                    print(f"[CACHE] Ignoring unreadable entry {path}: {e}")
+
+            result = await func(*args, **kwargs)
+            atomic_write_bytes(path, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+            await evict_lru_throttled(directory, max_entries, pattern="*.pkl")
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _open_yaml_cache() -> sqlite3.Connection:
+    DIR_CACHE.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(FILE_YAML_CACHE, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS yaml_cache (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            blob BLOB NOT NULL
+        )
+    """)
+    return conn
+
+
+def load_yaml_cached(path: Path):
+    """
+    Parses the YAML file at path, reusing the result of a previous parse while the file is unchanged.
+    Parsed documents are pickled in an SQLite database, keyed by the resolved path
+    and validated against the file modification time and size.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+
+    with closing(_open_yaml_cache()) as conn:
+        row = conn.execute(
+            "SELECT blob FROM yaml_cache WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (str(path), stat.st_mtime_ns, stat.st_size)
+        ).fetchone()
+        if row is not None:
+            try:
+                return pickle.loads(row[0])
+            except Exception as e:
+                print(f"[CACHE] Ignoring unreadable YAML entry for {path}: {e}")
+
+        # libyaml decodes the raw bytes itself, skipping Python's text-mode decoding layer
+        data = yaml.load(path.read_bytes(), Loader=YamlLoader)
+
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO yaml_cache (path, mtime_ns, size, blob) VALUES (?, ?, ?, ?)",
+                (str(path), stat.st_mtime_ns, stat.st_size, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+        return data
@@ -1,3 +1,4 @@
+import functools
 import os
 import getpass
 from dotenv import load_dotenv
@@ -9,6 +10,15 @@ load_dotenv()
 KEY_GROQ_API_KEY = "GROQ_API_KEY"
 KEY_OPENAI_API_KEY = "OPENAI_API_KEY"
 
+# Model used by get_llm when none is requested
+DEFAULT_MODEL_NAME = "gpt-4o"
+
+# Maximum number of LLM requests in flight for a single caller (an Assessor, the solution CLI)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+
+# Clients handed out by get_llm, closed together by close_llms
+_OPEN_CLIENTS = []
+
 def ensure_openai_api_key():
     if not os.environ.get(KEY_OPENAI_API_KEY):
         os.environ[KEY_OPENAI_API_KEY] = getpass.getpass("Enter API key for OpenAI: ")
@@ -25,14 +35,16 @@ def ensure_groq_api_key():
     return os.environ[KEY_GROQ_API_KEY]
 
 
+@functools.lru_cache(maxsize=8)
 def get_llm(model_name: str = None, output_format=None):
     """
     Creates and returns an OpenAIChatCompletionClient configured for Groq.
+    Clients are cached per (model_name, output_format), so callers share one connection pool.
     """
     if model_name is None:
         #model_name = "llama-3.3-70b-versatile"
         #model_name= "llama-3.1-8b-instant"
-        model_name = "gpt-4o"
+        model_name = DEFAULT_MODEL_NAME
 
     api_key = ensure_openai_api_key()
 
@@ -48,12 +60,25 @@ def get_llm(model_name: str = None, output_format=None):
             "function_calling": True,
             "json_output": True,
             "family": "llama",
-            "structured_output": False
+            "structured_output": True
         }
     )
+    _OPEN_CLIENTS.append(model_client)
     return model_client
 
 
+async def close_llms():
+    """
+    Closes every client created by get_llm and forgets them, so the next get_llm builds a new one.
+    Call it once, when the process is done with the LLMs.
+    """
+    clients = _OPEN_CLIENTS[:]
+    _OPEN_CLIENTS.clear()
+    get_llm.cache_clear()
+    for client in clients:
+        await client.close()
+
+
 class AIOracle:
     """Base class for AI-powered operations using Groq."""
 
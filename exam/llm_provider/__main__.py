@@ -1,6 +1,6 @@
 import asyncio
 
-from exam.llm_provider import get_llm
+from exam.llm_provider import close_llms, get_llm
 from autogen_core.models import UserMessage
 
 
@@ -12,7 +12,7 @@ async def main():
     print(f"  Classe: {type(default_llm)}")
     result = await default_llm.create([UserMessage(content="What is the capital of France?", source="user")])
     print(result)
-    await default_llm.close()
+    await close_llms()
 
 
 
@@ -1,7 +1,16 @@
-import json
+import asyncio
+import bisect
+import functools
+import os
+import sys
+from collections import OrderedDict
 from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import chain
+from pathlib import Path
 from typing import Dict
 import mlflow
+import orjson
 from mlflow.entities import SpanType
 
 from exam import DIR_ROOT
@@ -10,15 +19,168 @@ from exam.assess import Assessor
 from exam.solution import Answer, load_cache as load_answer_cache
 
 
-@dataclass
+def _dumps(obj) -> str:
+    """Serialises a tool result to indented JSON text."""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+
+
+def _file_stamp(filename, exams_dir):
+    """(mtime, size) of an exam file (resolved like load_exam_from_yaml does), None if missing."""
+    if not filename:
+        return None
+    path = Path(filename)
+    if not path.is_absolute():
+        path = Path(exams_dir) / filename
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@functools.lru_cache(maxsize=8)
+def _load_exam_memoized(questions_file, responses_file, grades_file, exams_dir, stamps):
+    # stamps only takes part in the cache key: editing any file yields a fresh parse.
+    # Across runs, load_exam_from_yaml reuses the parsed YAML documents from load_yaml_cached.
+    return load_exam_from_yaml(
+        questions_file=questions_file,
+        responses_file=responses_file,
+        grades_file=grades_file,
+        exams_dir=exams_dir
+    )
+
+
+def exam_file_stamps(questions_file: str, responses_file: str, grades_file: str = None, exams_dir=None) -> tuple:
+    """The _file_stamp of each file of an exam: editing any of them changes the result."""
+    if exams_dir is None:
+        exams_dir = DIR_ROOT / "static" / "se-exams"
+    return tuple(_file_stamp(f, exams_dir) for f in (questions_file, responses_file, grades_file))
+
+
+def load_exam_memoized(questions_file: str, responses_file: str, grades_file: str = None, exams_dir=None):
+    """
+    Same as load_exam_from_yaml, but reuses the parsed exam while its files are unchanged.
+    """
+    if exams_dir is None:
+        exams_dir = DIR_ROOT / "static" / "se-exams"
+    stamps = exam_file_stamps(questions_file, responses_file, grades_file, exams_dir)
+    return _load_exam_memoized(questions_file, responses_file, grades_file, exams_dir, stamps)
+
+
+class BoundedDict(OrderedDict):
+    """Dict keeping at most max_size entries, evicting the least recently used on insert."""
+
+    def __init__(self, *args, max_size: int, **kwargs):
+        self.max_size = max_size
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.max_size:
+            self.popitem(last=False)
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return super().__getitem__(key)
+
+
+# Bounds of the per-session caches of AssessmentContext
+MAX_CHECKLISTS = int(os.getenv("EXAM_MAX_CHECKLISTS", "2048"))
+MAX_FEATURE_ASSESSMENTS = int(os.getenv("EXAM_MAX_FEATURE_ASSESSMENTS", "4096"))
+
+
+@dataclass(slots=True)
 class AssessmentContext:
     """Shared context between tool calls."""
     loaded_answers: Dict[str, str] = field(default_factory=dict)
-    loaded_checklists: Dict[str, Answer] = field(default_factory=dict)
-    loaded_exams = {}
+    loaded_checklists: Dict[str, Answer] = field(default_factory=lambda: BoundedDict(max_size=MAX_CHECKLISTS))
+    # Per exam, only what the tools read: {"questions": [...], "student_emails": [...]}
+    loaded_exams: Dict[str, dict] = field(default_factory=dict)
+    # Per exam, the exam_file_stamps of the files it was loaded from
+    exam_stamps: Dict[str, tuple] = field(default_factory=dict)
+    # Per (exam_id, email), the data needed to assess the student: responses and original grades
+    student_data: Dict[tuple, dict] = field(default_factory=dict)
 
     # Assessment results
-    feature_assessments: Dict[str, list] = field(default_factory=dict)
+    feature_assessments: Dict[str, list] = field(
+        default_factory=lambda: BoundedDict(max_size=MAX_FEATURE_ASSESSMENTS)
+    )
+
+    # JSON list of the loaded student emails, rebuilt after an exam load
+    students_json: str | None = None
+
+    # Index of the students of loaded_exams: lowercase email -> (position, exam_id, email),
+    # plus the same entries sorted by email for prefix lookups
+    student_index: Dict[str, tuple] = field(default_factory=dict)
+    _sorted_emails: list = field(default_factory=list)
+    _sorted_students: list = field(default_factory=list)
+
+    def store_exam(self, exam_id: str, exam_data: dict, stamps: tuple = None):
+        """Keeps the projections of a parsed exam the tools need, replacing any previous load of it."""
+        # Question ids and emails recur in every lookup key: interned, they compare by identity
+        exam_id = sys.intern(exam_id)
+        for question in exam_data["questions"]:
+            if isinstance(question["id"], str):
+                question["id"] = sys.intern(question["id"])
+        emails = [sys.intern(student["email"]) for student in exam_data["students"]]
+
+        self.student_data = {key: data for key, data in self.student_data.items() if key[0] != exam_id}
+        for email, student in zip(emails, exam_data["students"]):
+            self.student_data.setdefault((exam_id, email), {
+                "responses": student["responses"],
+                "original_grades": student.get("original_grades", {})
+            })
+
+        self.loaded_exams[exam_id] = {
+            "questions": exam_data["questions"],
+            "student_emails": emails
+        }
+        self.exam_stamps[exam_id] = stamps
+        self._index_students()
+        self.students_json = None
+
+    def get_student(self, exam_id: str, email: str) -> dict:
+        return self.student_data[(exam_id, email)]
+
+    def _index_students(self):
+        entries = []
+        for loaded_id, loaded_exam in self.loaded_exams.items():
+            for email in loaded_exam["student_emails"]:
+                entries.append((email.lower(), len(entries), loaded_id, email))
+
+        self.student_index = {}
+        for email_lower, position, loaded_id, email in entries:
+            self.student_index.setdefault(email_lower, (position, loaded_id, email))
+
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        self._sorted_emails = [entry[0] for entry in entries]
+        self._sorted_students = [entry[1:] for entry in entries]
+
+    def find_student(self, email: str) -> tuple[str, str] | None:
+        """
+        Finds a loaded student by email, case-insensitively.
+        Emails of at least 10 characters also match as a prefix of the full email.
+        When several students match, the first one in loading order wins.
+
+        Returns:
+            (exam_id, full email) or None if no student matches.
+        """
+        prefix_match = len(email) >= 10
+        email = email.lower()
+        if not prefix_match:
+            match = self.student_index.get(email)
+            return (match[1], match[2]) if match else None
+
+        best = None
+        i = bisect.bisect_left(self._sorted_emails, email)
+        while i < len(self._sorted_emails) and self._sorted_emails[i].startswith(email):
+            if best is None or self._sorted_students[i][0] < best[0]:
+                best = self._sorted_students[i]
+            i += 1
+        return (best[1], best[2]) if best else None
 
     def get_session_id(self, question_id: str, student_code: str) -> str:
         return f"{question_id}_{student_code}"
@@ -32,6 +194,14 @@ class AssessmentContext:
         key = f"{question_id}_{student_code}"
         return self.loaded_answers.get(key)
 
+    def invalidate_checklists(self, question_ids):
+        """
+        Forgets the cached checklists of the given questions, e.g. those of an exam being (re)loaded.
+        The checklists of the other exams stay cached.
+        """
+        for question_id in question_ids:
+            self.loaded_checklists.pop(question_id, None)
+
     def store_checklist(self, question_id: str, checklist: Answer):
         self.loaded_checklists[question_id] = checklist
 
@@ -64,6 +234,9 @@ class ExamMCPServer:
     exams_dir = DIR_ROOT / "static" / "se-exams"
     exams_dir.mkdir(parents=True, exist_ok=True)
 
+    # Maximum number of students assessed concurrently by assess_students_batch
+    parallelism = int(os.getenv("EXAM_PARALLELISM", "8"))
+
     # -------------------------------------------
 
 
@@ -73,15 +246,19 @@ class ExamMCPServer:
         """
         Retrieve the list of all student emails currently loaded in the exam context.
         """
-        students = []
-        for exam_data in ExamMCPServer.context.loaded_exams.values():
-            for student in exam_data["students"]:
-                students.append(student["email"])
+        context = ExamMCPServer.context
+        if context.students_json is not None:
+            return context.students_json
+
+        students = list(chain.from_iterable(
+            exam_meta["student_emails"] for exam_meta in context.loaded_exams.values()
+        ))
 
         if not students:
-            return json.dumps({"error": "No students loaded. Did you run load_exam_tool first?"})
+            return _dumps({"error": "No students loaded. Did you run load_exam_tool first?"})
 
-        return json.dumps(students, indent=2)
+        context.students_json = _dumps(students)
+        return context.students_json
 
     @staticmethod
     @mlflow.trace(span_type=SpanType.TOOL)
@@ -89,36 +266,56 @@ class ExamMCPServer:
         """
         Load assessment checklists for a *list* of question IDs into memory.
         """
+        context = ExamMCPServer.context
+
+        # One cache probe per distinct question, then only the misses go further
+        cached = {question_id for question_id in set(question_ids) if context.get_checklist(question_id)}
+        pending = [question_id for question_id in question_ids if question_id not in cached]
+
         results = {
             "loaded": 0,
-            "skipped_cache": 0,
+            "skipped_cache": len(question_ids) - len(pending),
             "failed": []
         }
 
-        for question_id in question_ids:
-            try:
-                cached = ExamMCPServer.context.get_checklist(question_id)
-                if cached:
-                    results["skipped_cache"] += 1
-                    continue
+        # Missing checklists are read from disk concurrently, once per distinct question
+        misses = list(dict.fromkeys(pending))
 
-                question = ExamMCPServer.questions_store.question(question_id)
-                checklist = load_answer_cache(question)
+        def read_checklist(question_id):
+            question = ExamMCPServer.questions_store.question(question_id)
+            return load_answer_cache(question)
 
-                if not checklist:
-                    results["failed"].append(question_id)
-                    continue
+        checklists = await asyncio.gather(
+            *(asyncio.to_thread(read_checklist, question_id) for question_id in misses),
+            return_exceptions=True
+        )
+        read = dict(zip(misses, checklists))
 
-                ExamMCPServer.context.store_checklist(question_id, checklist)
-                results["loaded"] += 1
+        stored = set()
+        for question_id in pending:
+            if question_id in stored:
+                # Repeated id, already loaded by its first occurrence
+                results["skipped_cache"] += 1
+                continue
+
+            checklist = read[question_id]
+            if isinstance(checklist, Exception):
+                results["failed"].append(f"{question_id} ({str(checklist)})")
+                continue
+            if isinstance(checklist, BaseException):
+                raise checklist
 
-            except Exception as e:
-                results["failed"].append(f"{question_id} ({str(e)})")
+            if not checklist:
+                results["failed"].append(question_id)
                 continue
 
+            context.store_checklist(question_id, checklist)
+            stored.add(question_id)
+            results["loaded"] += 1
+
         status = "batch_completed" if not results["failed"] else "completed_with_errors"
 
-        return json.dumps({
+        return _dumps({
             "status": status,
             "summary": f"Loaded: {results['loaded']}, Cached: {results['skipped_cache']}, Failed: {len(results['failed'])}",
             "failed_ids": results["failed"]  # Restituiamo solo gli errori, che sono importanti
@@ -131,15 +328,17 @@ class ExamMCPServer:
         Load an entire exam from YAML files.
         """
         try:
-            exam_data = load_exam_from_yaml(
+            exam_data = load_exam_memoized(
                 questions_file=questions_file,
                 responses_file=responses_file,
                 grades_file=grades_file,
                 exams_dir=ExamMCPServer.exams_dir
             )
+            stamps = exam_file_stamps(questions_file, responses_file, grades_file, ExamMCPServer.exams_dir)
 
             exam_id = exam_data["exam_id"]
-            ExamMCPServer.context.loaded_exams[exam_id] = exam_data
+            ExamMCPServer.context.invalidate_checklists(q["id"] for q in exam_data["questions"])
+            ExamMCPServer.context.store_exam(exam_id, exam_data, stamps)
             question_ids = [q["id"] for q in exam_data["questions"]]
 
             summary_output = {
@@ -153,12 +352,12 @@ class ExamMCPServer:
                 "message": "Exam loaded. Use 'list_loaded_students_tool' to get emails."
             }
 
-            return json.dumps(summary_output, indent=2)
+            return _dumps(summary_output)
 
         except FileNotFoundError as e:
-            return json.dumps({"error": str(e)})
+            return _dumps({"error": str(e)})
         except Exception as e:
-            return json.dumps({"error": str(e)})
+            return _dumps({"error": str(e)})
 
     @staticmethod
     @mlflow.trace(span_type=SpanType.TOOL)
@@ -166,66 +365,134 @@ class ExamMCPServer:
         """
         Assess a BATCH of students in one go.
         Input: A list of student email strings (e.g. ["email1", "email2"]).
+        Output: the number of processed and failed students, and the NDJSON file with each student's result.
         """
-        results_summary = []
-        failed = []
-
         print(f"\n[BATCH] Starting assessment for {len(student_emails)} students...")
 
         # Initialize assessor once
         assessor = Assessor(evaluations_dir=ExamMCPServer.evaluations_dir)
-        questions = None  # Will be fetched from first valid student match
 
-        for student_email in student_emails:
-            try:
-                student_email_clean = student_email.rstrip('.').strip()
-                student_data = None
-                matched_email = None
+        # Per-student results are streamed to an NDJSON file, in the order the emails were requested,
+        # so the tool reply stays the same size whatever the size of the batch
+        batch_file = ExamMCPServer.evaluations_dir / f"batch_{datetime.now():%Y%m%d-%H%M%S-%f}.ndjson"
+        requested = list(dict.fromkeys(email.rstrip('.').strip() for email in student_emails))
+        # One slot per requested email, holding its line until all the lines before it are written
+        slots = [None] * len(requested)
+        written = 0
+        write_lock = asyncio.Lock()
+        counts = {"processed": 0, "failed": 0}
+
+        def record(position: int, entry: dict, failed: bool):
+            slots[position] = orjson.dumps({"email": requested[position], **entry}) + b"\n"
+            counts["failed" if failed else "processed"] += 1
+
+        out = await asyncio.to_thread(open, batch_file, "wb")
+
+        def append(data: bytes):
+            out.write(data)
+            out.flush()
+
+        async def flush():
+            """Appends the leading run of finished slots to the batch file."""
+            nonlocal written
+            async with write_lock:
+                end = written
+                while end < len(slots) and slots[end] is not None:
+                    end += 1
+                if end == written:
+                    return
+                data = b"".join(slots[written:end])
+                slots[written:end] = [None] * (end - written)
+                written = end
+                await asyncio.to_thread(append, data)
 
+        try:
+            # Resolve every distinct email against the loaded exams before dispatching the assessments.
+            # Requests resolving to the same student share a single assessment.
+            resolved = {}  # (matched_email, exam_id) -> positions of the requested emails
+            for position, student_email in enumerate(requested):
                 # Logic to find student data in memory
-                for exam_data in ExamMCPServer.context.loaded_exams.values():
-                    for student in exam_data["students"]:
-                        full_email = student["email"]
-                        if (full_email.lower() == student_email_clean.lower() or
-                                (len(student_email_clean) >= 10 and
-                                 full_email.lower().startswith(student_email_clean.lower()))):
-                            student_data = student
-                            questions = exam_data["questions"]
-                            matched_email = full_email
-                            break
-                    if student_data:
-                        break
-
-                if not student_data:
-                    failed.append(f"{student_email} (Not Found)")
+                match = ExamMCPServer.context.find_student(student_email)
+                if not match:
+                    record(position, {"status": "not_found"}, failed=True)
                     continue
 
-                # Perform assessment
-                result = await assessor.assess_student_exam(
-                    student_email=matched_email,
-                    exam_questions=questions,
-                    student_responses=student_data["responses"],
-                    questions_store=ExamMCPServer.questions_store,
-                    context=ExamMCPServer.context,
-                    original_grades=student_data.get("original_grades", {})
-                )
+                exam_id, matched_email = match
+                resolved.setdefault((matched_email, exam_id), []).append(position)
+            await flush()
+
+            # Questions and checklists are resolved once per exam, not once per student.
+            # An exam that cannot be prepared fails its own students only.
+            prepared_exams = {}
+            for _, exam_id in resolved:
+                if exam_id not in prepared_exams:
+                    try:
+                        prepared_exams[exam_id] = assessor.prepare_exam(
+                            ExamMCPServer.context.loaded_exams[exam_id]["questions"],
+                            ExamMCPServer.questions_store,
+                            ExamMCPServer.context
+                        )
+                    except Exception as e:
+                        prepared_exams[exam_id] = e
+
+            # Bound the number of students graded concurrently to stay under the provider rate limits
+            semaphore = asyncio.Semaphore(ExamMCPServer.parallelism)
+            # Progress lines are written in one go after the batch, instead of once per student
+            log_lines = []
+
+            async def assess_one(matched_email, exam_id, positions):
+                student_data = ExamMCPServer.context.get_student(exam_id, matched_email)
+                async with semaphore:
+                    try:
+                        if isinstance(prepared_exams[exam_id], Exception):
+                            raise prepared_exams[exam_id]
+                        result = await assessor.assess_student_exam(
+                            student_email=matched_email,
+                            exam_questions=ExamMCPServer.context.loaded_exams[exam_id]["questions"],
+                            student_responses=student_data["responses"],
+                            questions_store=ExamMCPServer.questions_store,
+                            context=ExamMCPServer.context,
+                            original_grades=student_data.get("original_grades", {}),
+                            prepared=prepared_exams[exam_id]
+                        )
+                    except Exception as e:
+                        for position in positions:
+                            record(position, {
+                                "matched_email": matched_email,
+                                "status": "error",
+                                "error": str(e)
+                            }, failed=True)
+                        await flush()
+                        return
 
                 score = result.get("calculated_score", 0.0)
-                max_score = result.get("max_score", 0.0)
-
-                print(f"[BATCH] Processed {matched_email[:15]}... Score: {score}")
-                results_summary.append(f"{matched_email}: {score}/{max_score}")
-
-            except Exception as e:
-                failed.append(f"{student_email} (Error: {str(e)})")
+                for position in positions:
+                    record(position, {
+                        "matched_email": matched_email,
+                        "status": "assessed",
+                        "score": score,
+                        "max_score": result.get("max_score", 0.0)
+                    }, failed=False)
+                log_lines.append(f"[BATCH] Processed {matched_email[:15]}... Score: {score}")
+                await flush()
+
+            await asyncio.gather(*(
+                assess_one(matched_email, exam_id, positions)
+                for (matched_email, exam_id), positions in resolved.items()
+            ))
+        finally:
+            # Every line flushed so far stays on disk, even when the batch is cancelled
+            out.close()
+
+        if log_lines:
+            sys.stdout.write("\n".join(log_lines) + "\n")
+            sys.stdout.flush()
 
         # Return a single summary for the whole batch
         output = {
             "status": "batch_completed",
-            "processed": len(results_summary),
-            "failed_count": len(failed),
-            "grades_summary": results_summary,
-            "failures": failed
+            "processed": counts["processed"],
+            "failed_count": counts["failed"],
+            "ndjson_path": str(batch_file)
         }
-        return json.dumps(output, indent=2)
-
+        return _dumps(output)
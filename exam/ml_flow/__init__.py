@@ -8,46 +8,52 @@ import mlflow
 class SimpleTokenCounter:
     """Simple token counter for tracking LLM usage."""
 
+    __slots__ = ('total', 'prompt', 'completion')
+
     def __init__(self):
         self.total = 0
         self.prompt = 0
         self.completion = 0
 
     def add(self, models_usage):
-        """Add usage from AutoGen models_usage object."""
-        if hasattr(models_usage, 'prompt_tokens'):
-            self.prompt += models_usage.prompt_tokens
-        if hasattr(models_usage, 'completion_tokens'):
-            self.completion += models_usage.completion_tokens
+        """Add usage from AutoGen models_usage object (missing counts, or a None usage, count as 0)."""
+        prompt = getattr(models_usage, 'prompt_tokens', 0) or 0
+        completion = getattr(models_usage, 'completion_tokens', 0) or 0
 
-        self.total = self.prompt + self.completion
+        self.prompt += prompt
+        self.completion += completion
+        self.total += prompt + completion
 
 from mlflow.entities import SpanType
 
 
-def calculate_overhead(run_id, total_time):
-    """Calculate the overhead time (total - tool execution time)"""
-    client = mlflow.MlflowClient()
+def calculate_overhead(run_id, total_time, client=None, experiment_id=None):
+    """
+    Calculate the overhead time (total - tool execution time).
+    Pass the experiment_id of the run when known, to skip fetching the run just to look it up.
+    """
+    if client is None:
+        client = mlflow.MlflowClient()
 
-    # Get run info
-    run = client.get_run(run_id)
-    run_info = run.info
+    if experiment_id is None:
+        experiment_id = client.get_run(run_id).info.experiment_id
 
     total_duration_ms = total_time * 1000
 
     # Get all traces for the run
     traces = client.search_traces(
-        locations=[run_info.experiment_id],
+        locations=[experiment_id],
         filter_string=f"attributes.run_id = '{run_id}'"
     )
 
-    # Sum tool execution times
-    tool_duration_ms = 0
-    if traces:
-        for trace in traces:
-            for span in trace.data.spans:
-                if span.span_type == SpanType.TOOL:
-                    tool_duration_ms += (span.end_time_ns - span.start_time_ns) / 1_000_000
+    # Sum tool execution times in integer nanoseconds, converting once at the end
+    tool_duration_ns = sum(
+        span.end_time_ns - span.start_time_ns
+        for trace in (traces or ())
+        for span in trace.data.spans
+        if span.span_type == SpanType.TOOL
+    )
+    tool_duration_ms = tool_duration_ns / 1_000_000
 
     # Calculate overhead
     overhead_ms = total_duration_ms - tool_duration_ms
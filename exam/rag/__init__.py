@@ -1,22 +1,52 @@
+import asyncio
+import functools
+import hashlib
 import json
+import queue
 import re
 import sqlite3
+import threading
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
 
 import sqlite_vec
-from openai import OpenAI
-from pydantic import BaseModel
+from openai import AsyncOpenAI, OpenAI
 
 from exam import DIR_ROOT
+from exam.cache import DIR_CACHE
 from exam.llm_provider import ensure_openai_api_key
 
 DIR_CONTENT = DIR_ROOT / "content"
 FILE_DB = DIR_ROOT / "slides-rag.db"
-MARKDOWN_FILES = list(DIR_CONTENT.glob("**/_index.md"))
-REGEX_SLIDE_DELIMITER = re.compile(r"^\s*(---|\+\+\+)")
-
-
-class Slide(BaseModel):
+# Kept outside FILE_DB, which is deleted whenever the slides database is rebuilt
+FILE_EMBEDDING_CACHE = DIR_CACHE / "embeddings.db"
+# A line starting with --- or +++, after any indentation
+REGEX_SLIDE_DELIMITER = re.compile(r"^[^\S\n]*(?:---|\+\+\+)", re.MULTILINE)
+REGEX_TRAILING_SPACE = re.compile(r"[^\S\n]+$", re.MULTILINE)
+REGEX_BLANK_RUN = re.compile(r"\n{3,}")
+QUERY_CACHE_SIZE = 512
+# The embeddings endpoint accepts up to 2048 inputs and 300k tokens per request
+EMBEDDING_BATCH_SIZE = 256
+# Character budget per request: ~4 characters per token, with margin below the token limit
+EMBEDDING_BATCH_CHARS = 800_000
+# Read-only connections serving concurrent searches
+READER_POOL_SIZE = 8
+# Embedding requests in flight at once while filling the database
+EMBEDDING_CONCURRENCY = 16
+# Values bound per IN (...) lookup: SQLite builds before 3.32 accept at most 999 parameters
+SQL_IN_CHUNK = 900
+
+
+@functools.cache
+def markdown_files() -> tuple[Path, ...]:
+    """Lists the slide decks under DIR_CONTENT, walking the tree on first use rather than at import time."""
+    return tuple(DIR_CONTENT.glob("**/_index.md"))
+
+
+@dataclass(slots=True, frozen=True)
+class Slide:
     content: str
     source: str
     lines: tuple[int, int]
@@ -27,53 +57,173 @@ class Slide(BaseModel):
         return self.content.count("\n") + 1 if self.content else 0
 
 
+def _collapse_blank_lines(body: str, last_was_blank: bool) -> tuple[str | None, bool]:
+    """
+    Right-strips the lines of body and collapses every run of blank lines into a single one,
+    dropping a leading run when the line before body was blank too.
+
+    Returns:
+        the resulting text, None when no line is left, and whether the last line of body is blank.
+    """
+    body = REGEX_TRAILING_SPACE.sub("", body)
+    if not body.strip("\n"):
+        # Blank lines only: at most one survives
+        return (None if last_was_blank else ""), True
+    core = body.strip("\n")
+    leading = "\n" if body[0] == "\n" and not last_was_blank else ""
+    trailing = "\n" if body[-1] == "\n" else ""
+    return leading + REGEX_BLANK_RUN.sub("\n\n", core) + trailing, bool(trailing)
+
+
+def _parse_file(file: Path) -> list[Slide]:
+    slides = []
+    source = str(file.relative_to(DIR_CONTENT))
+    text = file.read_text(encoding="utf-8")
+
+    slide_beginning_line_num = 0
+    slide_start = 0
+    line_number = 0
+    slide_index = 0
+    last_was_blank = False
+    for delimiter in REGEX_SLIDE_DELIMITER.finditer(text):
+        line_number += text.count("\n", slide_start, delimiter.start()) + 1
+        if slide_start < delimiter.start():
+            # Slide body without the newline ending its last line
+            content, last_was_blank = _collapse_blank_lines(text[slide_start:delimiter.start() - 1], last_was_blank)
+            if content is not None:
+                slides.append(Slide(
+                    content=content,
+                    source=source,
+                    lines=(slide_beginning_line_num, line_number - 1),
+                    index=slide_index,
+                ))
+                slide_index += 1
+        slide_beginning_line_num = line_number + 1
+        line_end = text.find("\n", delimiter.end())
+        slide_start = len(text) if line_end < 0 else line_end + 1
+
+    body = text[slide_start:]
+    line_number += body.count("\n")
+    if body.endswith("\n"):
+        body = body[:-1]
+    elif body:
+        # Last line without a final newline
+        line_number += 1
+    content = None
+    if slide_start < len(text):
+        content, last_was_blank = _collapse_blank_lines(body, last_was_blank)
+    slides.append(Slide(
+        content=content or "",
+        source=source,
+        lines=(slide_beginning_line_num, line_number - 1),
+        index=slide_index,
+    ))
+    return slides
+
+
 def all_slides(files=None):
+    """
+    Yields the slides of the given markdown files, by default all the slide decks under DIR_CONTENT.
+    Files are parsed one after the other: the decks are few and small, so parsing is cheaper than
+    handing them to worker processes. Slides are yielded in file order.
+    """
     if files is None:
-        files = MARKDOWN_FILES
+        files = markdown_files()
     for file in files:
-        with open(file, "r", encoding="utf-8") as f:
-            slide_beginning_line_num = 0
-            line_number = 0
-            slide_lines = []
-            slide_index = 0
-            last_was_blank = False
-            for line in f.readlines():
-                line_number += 1
-                if REGEX_SLIDE_DELIMITER.match(line):
-                    if slide_lines:
-                        yield Slide(
-                            content="\n".join(slide_lines),
-                            source=str(file.relative_to(DIR_CONTENT)),
-                            lines=(slide_beginning_line_num, line_number - 1),
-                            index=slide_index,
-                        )
-                        slide_index += 1
-                    slide_lines = []
-                    slide_beginning_line_num = line_number + 1
-                else:
-                    if (stripped := line.strip()) or not last_was_blank:
-                        slide_lines.append(line.rstrip())
-                    last_was_blank = not stripped
-            yield Slide(
-                content="\n".join(slide_lines),
-                source=str(file.relative_to(DIR_CONTENT)),
-                lines=(slide_beginning_line_num, line_number - 1),
-                index=slide_index,
-            )
+        yield from _parse_file(file)
+
+
+def _slide_hash(source: str, lines, index: int, content: str) -> bytes:
+    payload = json.dumps([source, list(lines), index, content], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+def slide_hash(slide: Slide) -> bytes:
+    """
+    Identifies a slide by its content and position, so that unchanged slides are not stored twice.
+    """
+    return _slide_hash(slide.source, slide.lines, slide.index, slide.content)
+
+
+def _embedding_batches(slides, max_count: int, max_chars: int = EMBEDDING_BATCH_CHARS):
+    """Splits slides in batches of at most max_count slides and, unless a single slide exceeds it, max_chars characters."""
+    chunk = []
+    chars = 0
+    for slide in slides:
+        size = len(slide.content)
+        if chunk and (len(chunk) == max_count or chars + size > max_chars):
+            yield chunk
+            chunk = []
+            chars = 0
+        chunk.append(slide)
+        chars += size
+    if chunk:
+        yield chunk
+
+
+def _quantize_int8(vector_blob: bytes) -> bytes:
+    """
+    Quantizes a float32 vector blob to int8, scaling its largest component to 127.
+    The scale differs between vectors, which cosine distance ignores.
+    """
+    values = array("f")
+    values.frombytes(vector_blob)
+    scale = 127 / (max(map(abs, values)) or 1.0)
+    return array("b", [round(value * scale) for value in values]).tobytes()
+
+
+def _select_in(conn: sqlite3.Connection, sql: str, values: list):
+    """
+    Yields the rows of sql, whose "{}" stands for the list of an IN clause,
+    querying values in chunks of at most SQL_IN_CHUNK parameters.
+    """
+    for start in range(0, len(values), SQL_IN_CHUNK):
+        chunk = values[start:start + SQL_IN_CHUNK]
+        yield from conn.execute(sql.format(", ".join("?" * len(chunk))), chunk)
+
+
+def _tune_sqlite(conn: sqlite3.Connection):
+    """
+    Sets the connection pragmas for fast commits and reads.
+    WAL mode creates the -wal and -shm sidecar files next to the database while it is open,
+    so the database is a single file only once every connection has been closed.
+    """
+    conn.executescript("""
+        PRAGMA journal_mode = WAL;
+        PRAGMA synchronous = NORMAL;
+        PRAGMA temp_store = MEMORY;
+        PRAGMA mmap_size = 268435456;
+        PRAGMA cache_size = -65536;
+    """)
+
+
+@functools.cache
+def get_openai_client() -> OpenAI:
+    """
+    Returns the OpenAI client shared by every vector store of the process,
+    so embedding requests reuse its pool of keep-alive connections.
+    """
+    return OpenAI()
+
+
+# Embedding models by hint keyword, checked in order: the first keyword found in the hint wins
+EMBEDDING_MODELS = (
+    (("large",), ("text-embedding-3-large", 3072)),
+    (("old", "ada"), ("text-embedding-ada-002", 1536)),
+)
+DEFAULT_EMBEDDING_MODEL = ("text-embedding-3-small", 1536)
 
 
 def get_model_config(model_hint):
     """
     Returns the model name and vector dimension based on the hint.
     """
-    model_hint = model_hint.lower() if model_hint else "small"
-
-    if "large" in model_hint:
-        return "text-embedding-3-large", 3072
-    elif "old" in model_hint or "ada" in model_hint:
-        return "text-embedding-ada-002", 1536
-    else:
-        return "text-embedding-3-small", 1536
+    if model_hint:
+        model_hint = model_hint.lower()
+        for keywords, config in EMBEDDING_MODELS:
+            if any(keyword in model_hint for keyword in keywords):
+                return config
+    return DEFAULT_EMBEDDING_MODEL
 
 
 class NativeVectorStore:
@@ -82,92 +232,147 @@ class NativeVectorStore:
     Replaces LangChain abstractions.
     """
 
-    def __init__(self, db_file: str, model_name: str, dims: int, table_name: str = "se_slides"):
+    def __init__(self, db_file: str, model_name: str, dims: int, table_name: str = "se_slides", int8: bool = False):
+        """
+        Args:
+            int8: when the database is created, store vectors quantized to int8 (4x smaller, cosine distance).
+                  Ignored for existing databases, which keep the storage they were created with.
+        """
         self.db_file = db_file
         self.model_name = model_name
         self.dims = dims
+        self.int8 = int8
         self.table_meta = f"{table_name}_meta"
         self.table_vec = f"{table_name}_vec"
 
-        self.client = OpenAI()
+        self.client = get_openai_client()
+        self._async_client = None
+        # Per instance, so the cache dies with the store and never mixes embedding models
+        self._query_blob = functools.lru_cache(maxsize=QUERY_CACHE_SIZE)(self._embed_query)
+
+        # Connections are shared with the worker threads of search_async, every use goes through _db_lock
+        self._db_lock = threading.RLock()
+        # Autocommit mode: writes open their transactions explicitly (see add_slides)
+        self.conn = self._connect()
+        # Searches run on read-only connections, so concurrent ones do not queue on _db_lock (WAL allows it)
+        self._readers = queue.SimpleQueue()
+        self._reader_slots = threading.BoundedSemaphore(READER_POOL_SIZE)
+        self._all_readers = []
 
-        self.conn = sqlite3.connect(db_file)
-        self.conn.enable_load_extension(True)
-        sqlite_vec.load(self.conn)
-        self.conn.enable_load_extension(False)
+        DIR_CACHE.mkdir(parents=True, exist_ok=True)
+        self.cache_conn = sqlite3.connect(FILE_EMBEDDING_CACHE, isolation_level=None, timeout=30, check_same_thread=False)
+        _tune_sqlite(self.cache_conn)
 
         self._init_db()
+        self._init_cache()
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False, cached_statements=256)
+        _tune_sqlite(conn)
+        conn.enable_load_extension(True)
+        sqlite_vec.load(conn)
+        conn.enable_load_extension(False)
+        if read_only:
+            conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    @contextmanager
+    def _reader(self):
+        """Lends a read-only connection from the pool, opening it on first need."""
+        with self._reader_slots:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                conn = self._connect(read_only=True)
+                with self._db_lock:
+                    self._all_readers.append(conn)
+            try:
+                yield conn
+            finally:
+                self._readers.put(conn)
+
+    def _init_cache(self):
+        self.cache_conn.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                hash BLOB PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL
+            )
+        """)
 
     def _init_db(self):
         with self.conn:
+            # Schema creation and migrations are applied atomically
+            self.conn.execute("BEGIN IMMEDIATE")
             self.conn.execute(f"""
                 CREATE TABLE IF NOT EXISTS {self.table_meta} (
                     rowid INTEGER PRIMARY KEY AUTOINCREMENT,
                     content TEXT,
                     source TEXT,
-                    lines TEXT,
-                    slide_index INTEGER
+                    line_start INTEGER,
+                    line_end INTEGER,
+                    slide_index INTEGER,
+                    content_hash BLOB
                 )
             """)
+            self._migrate_line_columns()
+            self._migrate_content_hash()
+            self.conn.execute(f"""
+                CREATE UNIQUE INDEX IF NOT EXISTS {self.table_meta}_content_hash
+                ON {self.table_meta}(content_hash)
+            """)
+            if self.int8:
+                embedding_column = f"embedding INT8[{self.dims}] distance_metric=cosine"
+            else:
+                embedding_column = f"embedding FLOAT[{self.dims}]"
             self.conn.execute(f"""
                 CREATE VIRTUAL TABLE IF NOT EXISTS {self.table_vec} USING vec0(
                     rowid INTEGER PRIMARY KEY,
-                    embedding FLOAT[{self.dims}]
+                    {embedding_column},
+                    source TEXT PARTITION KEY
                 )
             """)
-
-    def _get_embedding(self, text: str):
-        text = text.replace("\n", " ").strip()
-        if not text:
-            return None
-        return self.client.embeddings.create(input=[text], model=self.model_name).data[0].embedding
-
-    def add_slide(self, slide: Slide):
+        (vec_sql,) = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (self.table_vec,)).fetchone()
+        self.int8 = "int8[" in vec_sql.lower()
+        # vec0 tables cannot be altered: databases built before the partition key need a --force rebuild
+        self._vec_partitioned = "source" in {
+            row[1] for row in self.conn.execute(f"PRAGMA table_info({self.table_vec})")
+        }
+        self._prepare_sql()
+
+    def _prepare_sql(self):
+        # Rendered once, so the hot statements are byte-identical across calls and hit the statement cache
+        self._sql_insert_meta = f"""
+            INSERT INTO {self.table_meta} (rowid, content, source, line_start, line_end, slide_index, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
         """
-        Generates embedding and saves to the database.
+        vector = "vec_int8(?)" if self.int8 else "?"
+        if self._vec_partitioned:
+            self._sql_insert_vec = f"INSERT INTO {self.table_vec}(rowid, embedding, source) VALUES (?, {vector}, ?)"
+        else:
+            self._sql_insert_vec = f"INSERT INTO {self.table_vec}(rowid, embedding) VALUES (?, {vector})"
+        self._sql_next_rowid = f"""
+            SELECT MAX(
+                COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+                COALESCE((SELECT MAX(rowid) FROM {self.table_meta}), 0)
+            ) + 1
         """
-        clean_content = slide.content.strip()
-        if not clean_content:
-            return False
-
-        vector = self._get_embedding(clean_content)
-        if not vector:
-            return False
-
-        with self.conn:
-            cur = self.conn.execute(f"""
-                INSERT INTO {self.table_meta} (content, source, lines, slide_index)
-                VALUES (?, ?, ?, ?)
-            """, (slide.content, slide.source, json.dumps(slide.lines), slide.index))
-
-            row_id = cur.lastrowid
+        self._sql_search = self._render_search("")
+        self._sql_search_partition = self._render_search("AND source = ?")
 
-            self.conn.execute(f"""
-                INSERT INTO {self.table_vec}(rowid, embedding)
-                VALUES (?, ?)
-            """, (row_id, sqlite_vec.serialize_float32(vector)))
-        return True
-
-    def search(self, query: str, k: int = 4):
-        """
-        Performs semantic search with sqlite-vec.
-        """
-        query_vector = self._get_embedding(query)
-        if not query_vector:
-            return []
-
-        vector_blob = sqlite_vec.serialize_float32(query_vector)
-
-        sql = f"""
+    def _render_search(self, partition_clause: str) -> str:
+        vector = "vec_int8(?)" if self.int8 else "?"
+        return f"""
             WITH matches AS (
                 SELECT rowid, distance
                 FROM {self.table_vec}
-                WHERE embedding MATCH ? AND k = ?
+                WHERE embedding MATCH {vector} AND k = ? {partition_clause}
             )
             SELECT 
                 meta.content, 
                 meta.source, 
-                meta.lines, 
+                meta.line_start,
+                meta.line_end,
                 meta.slide_index,
                 m.distance
             FROM matches m
@@ -175,27 +380,275 @@ class NativeVectorStore:
             ORDER BY m.distance
         """
 
-        cursor = self.conn.execute(sql, (vector_blob, k))
+    def _meta_columns(self) -> set[str]:
+        return {row[1] for row in self.conn.execute(f"PRAGMA table_info({self.table_meta})")}
+
+    def _migrate_line_columns(self):
+        # Databases created when the line range was a JSON text column: split it into two integer columns.
+        # The old column is left in place, unused, as dropping columns needs SQLite 3.35
+        if "line_start" in self._meta_columns():
+            return
+        self.conn.execute(f"ALTER TABLE {self.table_meta} ADD COLUMN line_start INTEGER")
+        self.conn.execute(f"ALTER TABLE {self.table_meta} ADD COLUMN line_end INTEGER")
+        rows = self.conn.execute(f"SELECT rowid, lines FROM {self.table_meta}").fetchall()
+        self.conn.executemany(f"UPDATE {self.table_meta} SET line_start = ?, line_end = ? WHERE rowid = ?", [
+            (*(json.loads(lines) if lines else (None, None)), row_id)
+            for row_id, lines in rows
+        ])
+
+    def _migrate_content_hash(self):
+        # Databases created before content_hash existed: add the column and fill it from the stored slides
+        if "content_hash" in self._meta_columns():
+            return
+        self.conn.execute(f"ALTER TABLE {self.table_meta} ADD COLUMN content_hash BLOB")
+        rows = self.conn.execute(
+            f"SELECT rowid, source, line_start, line_end, slide_index, content FROM {self.table_meta}"
+        ).fetchall()
+        self.conn.executemany(f"UPDATE {self.table_meta} SET content_hash = ? WHERE rowid = ?", [
+            (_slide_hash(source, (line_start or 0, line_end or 0), index, content), row_id)
+            for row_id, source, line_start, line_end, index, content in rows
+        ])
+
+    def _get_embeddings(self, texts: list[str]) -> list[bytes | None]:
+        """
+        Embeds many texts, returning them serialized for sqlite-vec.
+        Embeddings are looked up in the persistent embedding cache first,
+        the missing ones are requested with a single call and then stored in the cache.
+        Blank texts are not embedded, their embedding is None.
+        """
+        keys, found, missing = self._lookup_embeddings(texts)
+        if missing:
+            data = self.client.embeddings.create(input=list(missing.values()), model=self.model_name).data
+            found.update(self._store_embeddings(missing, data))
+        return [found[key] if key is not None else None for key in keys]
+
+    async def _get_embeddings_async(self, texts: list[str]) -> list[bytes | None]:
+        """
+        Same as _get_embeddings, sending the request through the async client.
+        """
+        keys, found, missing = self._lookup_embeddings(texts)
+        if missing:
+            response = await self.async_client.embeddings.create(input=list(missing.values()), model=self.model_name)
+            found.update(self._store_embeddings(missing, response.data))
+        return [found[key] if key is not None else None for key in keys]
+
+    def _lookup_embeddings(self, texts: list[str]):
+        """
+        Returns the cache key of each text (None when blank),
+        the cached embeddings by key and the texts still to embed by key.
+        """
+        texts = [text.replace("\n", " ").strip() for text in texts]
+        keys = [self._embedding_key(text) if text else None for text in texts]
+        wanted = list({key for key in keys if key is not None})
+        if not wanted:
+            return keys, {}, {}
+
+        with self._db_lock:
+            found = dict(_select_in(
+                self.cache_conn, "SELECT hash, vector FROM embedding_cache WHERE hash IN ({})", wanted
+            ))
+        missing = {key: text for key, text in zip(keys, texts) if key is not None and key not in found}
+        return keys, found, missing
+
+    def _store_embeddings(self, missing: dict, data) -> dict[bytes, bytes]:
+        embedded = {
+            key: sqlite_vec.serialize_float32(item.embedding)
+            for key, item in zip(missing, sorted(data, key=lambda item: item.index))
+        }
+        with self._db_lock, self.cache_conn:
+            self.cache_conn.execute("BEGIN")
+            self.cache_conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (hash, model, vector) VALUES (?, ?, ?)",
+                [(key, self.model_name, vector) for key, vector in embedded.items()]
+            )
+        return embedded
+
+    def _embedding_key(self, text: str) -> bytes:
+        # The model is part of the key: different models give different vectors for the same text
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def add_slide(self, slide: Slide):
+        """
+        Generates embedding and saves to the database.
+        """
+        return self.add_slides([slide]) == 1
+
+    def add_slides(self, slides, batch: int = EMBEDDING_BATCH_SIZE) -> int:
+        """
+        Generates the embeddings of many slides and saves them to the database in a single transaction.
+        Embeddings are requested for up to `batch` slides at a time,
+        and fewer when their content exceeds EMBEDDING_BATCH_CHARS.
+        Slides with no content, or already stored, are skipped.
+
+        Returns:
+            the number of slides added.
+        """
+        slides = self._unstored(slides)
+        rows = []
+        for chunk in _embedding_batches(slides, batch):
+            embeddings = self._get_embeddings([slide.content for slide in chunk])
+            rows.extend((slide, vector) for slide, vector in zip(chunk, embeddings) if vector)
+        return self._insert_rows(rows)
+
+    async def add_slides_async(self, slides, batch: int = EMBEDDING_BATCH_SIZE) -> int:
+        """
+        Same as add_slides, with up to EMBEDDING_CONCURRENCY embedding requests in flight at once.
+        """
+        slides = self._unstored(slides)
+        semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+
+        async def embed(chunk):
+            async with semaphore:
+                return chunk, await self._get_embeddings_async([slide.content for slide in chunk])
+
+        results = await asyncio.gather(*(embed(chunk) for chunk in _embedding_batches(slides, batch)))
+        return self._insert_rows([
+            (slide, vector)
+            for chunk, embeddings in results
+            for slide, vector in zip(chunk, embeddings) if vector
+        ])
+
+    def _unstored(self, slides) -> list[Slide]:
+        """Filters out the slides already in the database, and repeated ones."""
+        by_hash = {slide_hash(slide): slide for slide in slides}
+        if not by_hash:
+            return []
+        with self._db_lock:
+            stored = {row[0] for row in _select_in(
+                self.conn, f"SELECT content_hash FROM {self.table_meta} WHERE content_hash IN ({{}})", list(by_hash)
+            )}
+        return [slide for content_hash, slide in by_hash.items() if content_hash not in stored]
+
+    def prune(self, keep: set[bytes]) -> int:
+        """
+        Deletes the slides whose hash is not in keep, e.g. slides edited or removed since they were stored.
+
+        Returns:
+            the number of slides deleted.
+        """
+        with self._db_lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            stale = [
+                (row_id,)
+                for row_id, content_hash in self.conn.execute(f"SELECT rowid, content_hash FROM {self.table_meta}")
+                if content_hash not in keep
+            ]
+            self.conn.executemany(f"DELETE FROM {self.table_meta} WHERE rowid = ?", stale)
+            self.conn.executemany(f"DELETE FROM {self.table_vec} WHERE rowid = ?", stale)
+        return len(stale)
+
+    def _insert_rows(self, rows: list[tuple[Slide, bytes]]) -> int:
+        if not rows:
+            return 0
+
+        with self._db_lock, self.conn:
+            # The write lock is held from here, so the rowids computed below stay free until commit
+            self.conn.execute("BEGIN IMMEDIATE")
+            first_id = self._next_rowid()
+            row_ids = range(first_id, first_id + len(rows))
+
+            self.conn.executemany(self._sql_insert_meta, [
+                (row_id, slide.content, slide.source, *slide.lines, slide.index, slide_hash(slide))
+                for row_id, (slide, _) in zip(row_ids, rows)
+            ])
+            self.conn.executemany(self._sql_insert_vec, [
+                (row_id, self._stored_vector(vector), slide.source) if self._vec_partitioned
+                else (row_id, self._stored_vector(vector))
+                for row_id, (slide, vector) in zip(row_ids, rows)
+            ])
+        return len(rows)
+
+    def _next_rowid(self) -> int:
+        # Same value AUTOINCREMENT would pick: never reuse a rowid, even of deleted rows
+        row = self.conn.execute(self._sql_next_rowid, (self.table_meta,)).fetchone()
+        return row[0]
+
+    def _embed_query(self, query: str) -> bytes | None:
+        return self._get_embeddings([query])[0]
+
+    def search(self, query: str, k: int = 4, source_filter: str = None):
+        """
+        Performs semantic search with sqlite-vec.
+        Query embeddings are cached, so repeated queries skip the embedding request.
+
+        Args:
+            query: the text to search for
+            k: the number of results
+            source_filter: when given, only the slides of this deck (as in Slide.source) are searched
+        """
+        vector_blob = self._query_blob(" ".join(query.split()))
+        if not vector_blob:
+            return []
+        return self._search_blob(vector_blob, k, source_filter)
+
+    async def search_async(self, query: str, k: int = 4, source_filter: str = None):
+        """
+        Same as search, run in a worker thread so the embedding request does not block the event loop.
+        """
+        return await asyncio.to_thread(self.search, query, k, source_filter)
+
+    def search_batch(self, queries: list[str], k: int = 4, source_filter: str = None) -> list[list[dict]]:
+        """
+        Performs semantic search for many queries, embedding all of them with a single request.
+        Returns one list of results per query, in the same order as the queries.
+        """
+        return [
+            self._search_blob(vector_blob, k, source_filter) if vector_blob else []
+            for vector_blob in self._get_embeddings(queries)
+        ]
+
+    def _stored_vector(self, vector_blob: bytes) -> bytes:
+        return _quantize_int8(vector_blob) if self.int8 else vector_blob
+
+    def _search_blob(self, vector_blob: bytes, k: int, source_filter: str = None):
+        vector_blob = self._stored_vector(vector_blob)
+        if source_filter is None:
+            sql, params = self._sql_search, (vector_blob, k)
+        elif self._vec_partitioned:
+            sql, params = self._sql_search_partition, (vector_blob, k, source_filter)
+        else:
+            raise ValueError(f"{self.db_file} has no source partition key, rebuild it with --fill --force")
+
+        with self._reader() as reader:
+            rows = reader.execute(sql, params).fetchall()
 
         results = []
-        for row in cursor.fetchall():
+        for row in rows:
             results.append({
                 "content": row[0],
                 "source": row[1],
-                "lines": json.loads(row[2]) if row[2] else [],
-                "index": row[3],
-                "distance": row[4]
+                "lines": [row[2], row[3]] if row[2] is not None else [],
+                "index": row[4],
+                "distance": row[5]
             })
         return results
 
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        # Created on first use: only the database fill runs embeddings concurrently
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI()
+        return self._async_client
+
     def close(self):
+        for reader in self._all_readers:
+            reader.close()
+        self._all_readers.clear()
         self.conn.close()
+        self.cache_conn.close()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+        self.close()
 
 
 def sqlite_vector_store(
         db_file: str = str(FILE_DB),
         model: str = None,
-        table_name: str = "se_slides"):
+        table_name: str = "se_slides",
+        int8: bool = False):
     """
     Helper function to get the database instance.
     Returns a NativeVectorStore object.
@@ -207,5 +660,6 @@ def sqlite_vector_store(
         db_file=db_file,
         model_name=model_name,
         dims=dims,
-        table_name=table_name
+        table_name=table_name,
+        int8=int8
     )
\ No newline at end of file
@@ -1,57 +1,75 @@
+import asyncio
 import sys
 import os
 import time
-from exam.rag import sqlite_vector_store, all_slides, FILE_DB
+from itertools import islice
+
+from exam.rag import sqlite_vector_store, all_slides, slide_hash, FILE_DB, EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY
+
+# Enough slides per transaction to keep every concurrent embedding request busy
+BATCH_SIZE = EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY
 
 
 def print_separator():
     print("-" * 60)
 
 
-def recreate_database():
-    if os.path.exists(FILE_DB):
-        try:
-            os.remove(FILE_DB)
-            print(f"Deleted existing database: {FILE_DB}")
-        except OSError as e:
-            print(f"Error deleting database: {e}")
-            return
-
-    print(f"Creating new database at: {FILE_DB}")
+async def recreate_database(force: bool = False, int8: bool = False):
+    """
+    Brings the database up to date with the slide decks: new or edited slides are embedded and stored,
+    slides no longer in the decks are deleted.
+    When forced, the database is deleted and rebuilt from scratch.
+    int8 selects quantized vector storage when the database is created.
+    """
+    if force:
+        if os.path.exists(FILE_DB):
+            try:
+                os.remove(FILE_DB)
+                print(f"Deleted existing database: {FILE_DB}")
+            except OSError as e:
+                print(f"Error deleting database: {e}")
+                return
+        # Stale WAL sidecars would otherwise be replayed into the new database
+        for suffix in ("-wal", "-shm"):
+            sidecar = f"{FILE_DB}{suffix}"
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+
+    print(f"{'Updating' if os.path.exists(FILE_DB) else 'Creating new'} database at: {FILE_DB}")
 
     try:
-        vstore = sqlite_vector_store(table_name="se_slides")
+        vstore = sqlite_vector_store(table_name="se_slides", int8=int8)
     except Exception as e:
         print(f"Initialization error: {e}")
         return
 
-    slides = list(all_slides())
-    total_slides = len(slides)
-    print(f"Found {total_slides} slides to process.")
-
     count = 0
     skipped = 0
     start_time = time.time()
+    current = set()
 
-    for s in slides:
+    # Slides are streamed from the parser BATCH_SIZE at a time, each batch written in a single transaction
+    slides = all_slides()
+    while batch := list(islice(slides, BATCH_SIZE)):
+        current.update(slide_hash(s) for s in batch)
         try:
-            success = vstore.add_slide(s)
-            if success:
-                count += 1
-                if count % 50 == 0:
-                    print(f"Processed {count}/{total_slides} slides...")
-            else:
-                skipped += 1
+            added = await vstore.add_slides_async(batch)
+            count += added
+            skipped += len(batch) - added
+            print(f"Processed {count + skipped} slides...")
         except Exception as e:
-            print(f"Error processing slide {s.index} ({s.source}): {e}")
+            first, last = batch[0], batch[-1]
+            print(f"Error processing slides {first.index} ({first.source}) to {last.index} ({last.source}): {e}")
 
-    vstore.close()
+    removed = vstore.prune(current)
+    await vstore.aclose()
 
     elapsed = time.time() - start_time
     print_separator()
     print(f"Database generation complete.")
     print(f"Total added: {count}")
-    print(f"Total skipped: {skipped}")
+    print(f"Total skipped (unchanged or empty): {skipped}")
+    print(f"Total removed: {removed}")
     print(f"Time taken: {elapsed:.2f}s")
 
 
@@ -112,7 +130,7 @@ def interactive_search():
 
 def main():
     if "--fill" in sys.argv:
-        recreate_database()
+        asyncio.run(recreate_database(force="--force" in sys.argv, int8="--int8" in sys.argv))
     else:
         interactive_search()
 
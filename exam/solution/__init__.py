@@ -1,9 +1,14 @@
+import asyncio
+import functools
 import json
+import re
 
+import orjson
 from pydantic import BaseModel, Field
-from yaml import safe_dump, safe_load
+from yaml import load as yaml_load
 from autogen_core.models import UserMessage
-from exam import DIR_ROOT, Question
+from exam import DIR_ROOT, Question, YamlLoader
+from exam.cache import atomic_write_bytes
 from exam.llm_provider import AIOracle
 from exam.rag import sqlite_vector_store
 
@@ -41,24 +46,42 @@ class Answer(BaseModel):
 
 TEMPLATE = FILE_TEMPLATE.read_text(encoding="utf-8")
 
+# The template split around its per-question fields ({question}, then {help}), with the class name
+# already substituted, so building a prompt is plain concatenation. The template has no escaped braces
+_PROMPT_HEAD, _PROMPT_MIDDLE, _PROMPT_TAIL = re.split(
+    r"\{question\}|\{help\}", TEMPLATE.replace("{class_name}", Answer.__name__)
+)
+
 
 def get_prompt(question: str, *helps: str) -> str:
     """
-    Creates the prompt using standard Python formatting.
+    Creates the prompt by filling the question and the course material snippets into the template.
     """
-    help_string = "\n\n".join(helps) if helps else ""
-
-    return TEMPLATE.format(
-        class_name=Answer.__name__,
-        question=question,
-        help=help_string
-    )
+    return _PROMPT_HEAD + question + _PROMPT_MIDDLE + "\n\n".join(helps) + _PROMPT_TAIL
 
 
 def cache_file(question: Question):
+    return DIR_SOLUTIONS / f"{question.id}.json"
+
+
+def legacy_cache_file(question: Question):
+    """Answers cached before the switch to JSON, still read when no JSON entry exists."""
     return DIR_SOLUTIONS / f"{question.id}.yaml"
 
 
+def cache_stamps(question: Question) -> tuple:
+    """(mtime, size) of the JSON and legacy YAML cache files of a question, None for a missing one."""
+    stamps = []
+    for path in (cache_file(question), legacy_cache_file(question)):
+        try:
+            stat = path.stat()
+        except OSError:
+            stamps.append(None)
+        else:
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
 def save_cache(
         question: Question,
         answer: Answer,
@@ -66,37 +89,40 @@ def save_cache(
         model_name: str = None,
         model_provider: str = None):
     cache_file_path = cache_file(question)
-    with open(cache_file_path, "w", encoding="utf-8") as f:
-        print(f"Saving answer to {cache_file_path}")
-        yaml = answer.model_dump()
-        yaml["question"] = question.text
-        yaml["helps"] = helps
-        yaml["id"] = question.id
-        if model_name:
-            yaml["model_name"] = model_name
-        if model_provider:
-            yaml["model_provider"] = model_provider
-        yaml["prompt_template"] = TEMPLATE
-        safe_dump(yaml, f, sort_keys=True, allow_unicode=True)
-        return yaml
+    print(f"Saving answer to {cache_file_path}")
+    record = answer.model_dump()
+    record["question"] = question.text
+    record["helps"] = helps
+    record["id"] = question.id
+    if model_name:
+        record["model_name"] = model_name
+    if model_provider:
+        record["model_provider"] = model_provider
+    record["prompt_template"] = TEMPLATE
+    atomic_write_bytes(cache_file_path, orjson.dumps(record, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+    return record
 
 
 def load_cache(question: Question) -> Answer | None:
     cache_file_path = cache_file(question)
-    if not cache_file_path.exists():
-        return None
-    with open(cache_file_path, "r", encoding="utf-8") as f:
-        print(f"Loading cached answer from {cache_file_path}")
-        try:
-            cached_answer = safe_load(f)
-            return Answer(
-                core=cached_answer.get("core", []),
-                details_important=cached_answer.get("details_important", []),
-            )
-        except Exception as e:
-            print(f"Error loading cached answer from {cache_file_path}: {e}")
-            cache_file_path.unlink()
+    if cache_file_path.exists():
+        parse = orjson.loads
+    else:
+        cache_file_path = legacy_cache_file(question)
+        if not cache_file_path.exists():
             return None
+        parse = functools.partial(yaml_load, Loader=YamlLoader)
+    print(f"Loading cached answer from {cache_file_path}")
+    try:
+        cached_answer = parse(cache_file_path.read_bytes())
+        return Answer(
+            core=cached_answer.get("core", []),
+            details_important=cached_answer.get("details_important", []),
+        )
+    except Exception as e:
+        print(f"Error loading cached answer from {cache_file_path}: {e}")
+        cache_file_path.unlink()
+        return None
 
 
 class SolutionProvider(AIOracle):
@@ -106,13 +132,13 @@ class SolutionProvider(AIOracle):
         self.__use_helps = self.__vector_store.dims > 0
 
     async def answer(self, question: Question, max_helps=5) -> Answer:
-        if cache := load_cache(question):
+        if cache := await asyncio.to_thread(load_cache, question):
             return cache
         text = question.text
         helps = []
 
         if self.__use_helps:
-            helps = [doc['content'] for doc in self.__vector_store.search(text, k=max_helps)]
+            helps = [doc['content'] for doc in await self.__vector_store.search_async(text, k=max_helps)]
 
         prompt = get_prompt(text, *helps)
 
@@ -120,7 +146,7 @@ class SolutionProvider(AIOracle):
             messages=[UserMessage(content=prompt, source="user")]
         )
 
-        result_content = result_msg.content if hasattr(result_msg, 'content') else str(result_msg)
+        result_content = result_msg if isinstance(result_msg, str) else result_msg.content
 
         try:
             result_clean = result_content.strip()
@@ -139,7 +165,7 @@ class SolutionProvider(AIOracle):
 
             answer = Answer(**data)
 
-            save_cache(question, answer, helps, self.model_name, self.model_provider)
+            await asyncio.to_thread(save_cache, question, answer, helps, self.model_name, self.model_provider)
             return answer
 
         except (json.JSONDecodeError, ValueError) as e:
@@ -1,6 +1,7 @@
 import asyncio
 
 from exam import *
+from exam.llm_provider import LLM_CONCURRENCY
 from exam.solution import SolutionProvider
 import sys
 
@@ -13,10 +14,17 @@ async def main():
     else:
         targets = questions.questions
 
-    for q in targets:
+    semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+
+    async def answer(q):
+        async with semaphore:
+            return await llm.answer(q)
+
+    answers = await asyncio.gather(*(answer(q) for q in targets))
+
+    for q, a in zip(targets, answers):
         print(q.id)
         print("\t", q.text)
-        a = await llm.answer(q)
         print(a.pretty(indent=1))
         print("---")
     